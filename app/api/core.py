@@ -1,5 +1,13 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
+from app.core.http import download_client
+from app.core.idempotency import idempotency_store
+from app.core.jobs import job_queue
+from app.core import llm
+from app.core.ratelimit import rate_limit_stats
+from app.core.resilience import resilience_stats
+from app.utils.image_cache import image_cache
+from app.services.image_scorer_service import score_cache
 
 
 router = APIRouter()
@@ -10,4 +18,18 @@ async def check():
 
 @router.get("/healthcheck")
 async def healthcheck():
-    return JSONResponse(content={"status": "ok", "message": "AI Server is running."})
\ No newline at end of file
+    return JSONResponse(content={"status": "ok", "message": "AI Server is running."})
+
+@router.get("/metrics")
+async def metrics():
+    return JSONResponse(content={
+        "download": download_client.stats(),
+        "image_cache": image_cache.stats(),
+        "score_cache": score_cache.stats(),
+        "jobs": job_queue.stats(),
+        "idempotency": idempotency_store.stats(),
+        "llm_usage": llm.usage_stats(),
+        "llm_hedge": llm.hedge_stats(),
+        "llm_rate_limit": rate_limit_stats(),
+        "llm_resilience": resilience_stats(),
+    })
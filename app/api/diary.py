@@ -1,15 +1,40 @@
-from fastapi import APIRouter, HTTPException, Request
+import json
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from app.schemas.diary_schema import DiaryRequest, DiaryResponse, DiaryModifyRequest
-from app.services.diary_service import generate_diary_by_ai, modify_diary
+from app.services.diary_service import generate_diary_by_ai, modify_diary, stream_diary, stream_modify
+from app.core.idempotency import IdempotencyConflictError, idempotency_key, idempotency_store
 from app.core.logger import logger
 
 router = APIRouter()
 
+async def run_once(scope: str, req, key: Optional[str], response: Response, fn) -> DiaryResponse:
+    """
+    같은 키(Idempotency-Key 헤더 또는 요청 본문 해시)의 중복 요청은 진행 중인 호출을 함께 기다린다.
+    완료 후 보관된 결과를 돌려주는 것은 Idempotency-Key 헤더를 보낸 경우만.
+    """
+    body = req.model_dump_json()
+    try:
+        result, outcome = await idempotency_store.run(
+            idempotency_key(scope, key, body), idempotency_store.fingerprint(body), fn, store=key is not None,
+        )
+    except IdempotencyConflictError:
+        raise HTTPException(status_code=422, detail="같은 Idempotency-Key 로 다른 요청이 이미 처리되었습니다.")
+    if outcome != "executed":
+        logger.info(f"[{scope}] 중복 요청 ({outcome})")
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
 @router.post("/generate", response_model=DiaryResponse)
-async def generate(req: DiaryRequest) -> DiaryResponse:
+async def generate(
+    req: DiaryRequest,
+    response: Response,
+    idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key"),
+) -> DiaryResponse:
     try:
         logger.info(f"[generate_diary] 요청 수신: {req}")
-        return await generate_diary_by_ai(req)
+        return await run_once("generate", req, idempotency_key_header, response, lambda: generate_diary_by_ai(req))
     except RuntimeError as e:
         error_code = str(e)
         if error_code == "API_CONNECTION_ERROR":
@@ -18,14 +43,20 @@ async def generate(req: DiaryRequest) -> DiaryResponse:
             raise HTTPException(status_code=429, detail="OpenAI 할당량 초과")
         elif error_code.startswith("API_STATUS_"):
             raise HTTPException(status_code=502, detail="OpenAI API 응답 오류")
+        elif error_code == "PROVIDER_UNAVAILABLE":
+            raise HTTPException(status_code=503, detail="AI 서버 장애로 잠시 요청을 받을 수 없습니다.")
         else:
             raise HTTPException(status_code=500, detail="일기 수정 중 알 수 없는 오류 발생")
 
 @router.post("/modify", response_model = DiaryResponse)
-async def modify(req: DiaryModifyRequest) -> DiaryResponse:
+async def modify(
+    req: DiaryModifyRequest,
+    response: Response,
+    idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key"),
+) -> DiaryResponse:
     try:
         logger.info(f"[modify_diary] 요청 수신: {req}")
-        return await modify_diary(req)
+        return await run_once("modify", req, idempotency_key_header, response, lambda: modify_diary(req))
     except RuntimeError as e:
         error_code = str(e)
         if error_code == "API_CONNECTION_ERROR":
@@ -34,5 +65,29 @@ async def modify(req: DiaryModifyRequest) -> DiaryResponse:
             raise HTTPException(status_code=429, detail="OpenAI 할당량 초과")
         elif error_code.startswith("API_STATUS_"):
             raise HTTPException(status_code=502, detail="OpenAI API 응답 오류")
+        elif error_code == "PROVIDER_UNAVAILABLE":
+            raise HTTPException(status_code=503, detail="AI 서버 장애로 잠시 요청을 받을 수 없습니다.")
         else:
             raise HTTPException(status_code=500, detail="일기 수정 중 알 수 없는 오류 발생")
+
+def sse_response(events) -> StreamingResponse:
+    """(event, data) 를 Server-Sent Events 로 전송 (delta ... emoji 또는 error)"""
+    async def stream():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/generate/stream")
+async def generate_stream(req: DiaryRequest) -> StreamingResponse:
+    logger.info(f"[generate_diary_stream] 요청 수신: {req}")
+    return sse_response(stream_diary(req))
+
+@router.post("/modify/stream")
+async def modify_stream(req: DiaryModifyRequest) -> StreamingResponse:
+    logger.info(f"[modify_diary_stream] 요청 수신: {req}")
+    return sse_response(stream_modify(req))
@@ -1,9 +1,23 @@
-from fastapi import APIRouter
-from app.schemas.image_schema import ImageScoringRequest, ImageScoringResponse
-from app.services.image_scorer_service import score_images
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.schemas.image_schema import ImageScoringRequest, ImageScoringResponse, ImageScoringBatchRequest
+from app.services.image_scorer_service import score_images, score_batch
+from app.core.config import SCORE_BATCH_MAX_ALBUMS
 
 router = APIRouter()
 
 @router.post("/score")
 async def score_image(request: ImageScoringRequest)->ImageScoringResponse:
-    return await score_images(request)
\ No newline at end of file
+    return await score_images(request)
+
+@router.post("/score/batch")
+async def score_image_batch(request: ImageScoringBatchRequest) -> StreamingResponse:
+    """앨범별 결과를 끝나는 순서대로 한 줄씩 (NDJSON) 스트리밍"""
+    if len(request.albums) > SCORE_BATCH_MAX_ALBUMS:
+        raise HTTPException(status_code=413, detail=f"앨범은 요청당 최대 {SCORE_BATCH_MAX_ALBUMS}개까지 가능")
+
+    async def lines():
+        async for result in score_batch(request):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,75 @@
+import json
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.schemas.image_schema import ImageScoringRequest
+from app.schemas.diary_schema import DiaryRequest
+from app.schemas.job_schema import JobCreatedResponse, JobStatusResponse
+from app.services.image_scorer_service import score_album
+from app.services.diary_service import generate_diary_by_ai
+from app.core.jobs import Job, JobQueueFullError, job_queue
+from app.core.logger import logger
+
+router = APIRouter(prefix="/jobs")
+
+
+async def submit(kind: str, fn) -> JobCreatedResponse:
+    try:
+        job = await job_queue.submit(kind, fn)
+    except JobQueueFullError:
+        raise HTTPException(status_code=503, detail="작업 대기열이 가득 찼습니다. 잠시 후 다시 시도해 주세요.")
+    logger.info(f"[job 등록] {kind} {job.id}")
+    return JobCreatedResponse(jobId=job.id, status=job.status)
+
+
+def to_response(job: Job) -> JobStatusResponse:
+    return JobStatusResponse(
+        jobId=job.id,
+        kind=job.kind,
+        status=job.status,
+        stage=job.stage,
+        result=job.result,
+        error=job.error,
+        events=job.events,
+    )
+
+
+@router.post("/score", status_code=202)
+async def score_job(request: ImageScoringRequest) -> JobCreatedResponse:
+    async def run():
+        # 실패는 예외로 올려 job 상태를 failed 로 남김
+        return (await score_album(request)).model_dump()
+    return await submit("score", run)
+
+@router.post("/generate", status_code=202)
+async def generate_job(req: DiaryRequest) -> JobCreatedResponse:
+    async def run():
+        return (await generate_diary_by_ai(req)).model_dump()
+    return await submit("generate", run)
+
+@router.get("/{job_id}")
+async def get_job(job_id: str) -> JobStatusResponse:
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return to_response(job)
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    """처리 단계를 Server-Sent Events 로 전송. done/failed 이벤트에 결과/오류를 담고 스트림을 닫는다."""
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+
+    async def stream():
+        async for event in job_queue.events(job_id):
+            data = dict(event)
+            if event["stage"] in ("done", "failed"):
+                job = await job_queue.get(job_id)
+                if job is not None:
+                    data.update(result=job.result, error=job.error)
+            yield f"event: {event['stage']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
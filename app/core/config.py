@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 import google.generativeai as genai
 
 load_dotenv()
@@ -12,5 +11,142 @@ if not GOOGLE_API_KEY:
     raise RuntimeError("GOOGLE_API_KEY is missing!")
 genai.configure(api_key=GOOGLE_API_KEY)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-model = genai.GenerativeModel('models/gemini-2.5-flash')
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
+
+# LLM provider 설정 ("openai" | "gemini" | "stub")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+# hedged request: 첫 provider 응답이 최근 지연 분포의 percentile 을 넘으면 다른 provider 에도 요청하고 먼저 온 응답 사용
+# 보조 provider 경로 ("주:보조" 쉼표 구분, 예: "openai:gemini,gemini:openai"). 비어 있으면 hedge 하지 않음 (기본값)
+# 설정하면 사진/일기 프롬프트가 보조 provider 에도 전송되고, hedge 된 호출은 양쪽에 과금된다.
+LLM_HEDGE_ROUTES = dict(
+    route.strip().split(":", 1) for route in os.getenv("LLM_HEDGE_ROUTES", "").split(",") if ":" in route
+)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# provider/model 별로 최근 몇 건의 지연을 기준으로 삼을지, 최소 몇 건부터 percentile 을 쓸지
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# 표본이 부족할 때 사용하는 대기 시간
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "20"))
+# Gemini 요청을 OpenAI 로 보낼 때 사용할 모델
+LLM_HEDGE_OPENAI_MODEL = os.getenv("LLM_HEDGE_OPENAI_MODEL", "gpt-4.1")
+
+# provider/model 별 요청 수(RPM)/토큰 수(TPM) 제한. 초과분은 대기열에서 기다렸다가 보냄 (0 이면 제한 없음)
+LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", "500"))
+LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", "450000"))
+# 모델별 제한 ("provider/model=rpm:tpm" 쉼표 구분, 예: "openai/gpt-4.1-nano=500:200000")
+LLM_RATE_LIMITS = {
+    key.strip(): tuple(int(v) for v in value.split(":", 1))
+    for key, value in (
+        entry.split("=", 1) for entry in os.getenv("LLM_RATE_LIMITS", "").split(",") if "=" in entry
+    )
+}
+# provider/model 별 대기열 최대 길이와 최대 대기 시간 (초과 시 RATE_LIMIT 오류)
+LLM_RATE_MAX_WAITERS = int(os.getenv("LLM_RATE_MAX_WAITERS", "200"))
+LLM_RATE_MAX_WAIT_SECONDS = float(os.getenv("LLM_RATE_MAX_WAIT_SECONDS", "30"))
+# 응답 토큰 예상치 (요청 전 TPM 예약에 사용, 응답 후 실제 사용량으로 보정)
+LLM_RATE_OUTPUT_TOKENS = int(os.getenv("LLM_RATE_OUTPUT_TOKENS", "500"))
+
+# 일시적 provider 오류(연결 실패/5xx) 재시도: 최대 시도 횟수, 지수 backoff (full jitter) 기준/상한
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_MAX_BACKOFF_SECONDS", "8"))
+# 호출자가 deadline 을 주지 않았을 때 첫 시도부터 재시도를 포기하기까지의 시간
+LLM_RETRY_BUDGET_SECONDS = float(os.getenv("LLM_RETRY_BUDGET_SECONDS", "30"))
+# provider/model 별 circuit breaker: 연속 실패 횟수가 넘으면 열고, 일정 시간 뒤 한 건씩 시험 호출
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# 로컬 stub provider 응답 지연 (벤치마크용)
+LLM_STUB_LATENCY_SECONDS = float(os.getenv("LLM_STUB_LATENCY_SECONDS", "0.5"))
+
+# 이미지 디코딩 executor 설정 ("process" | "thread")
+DECODE_BACKEND = os.getenv("DECODE_BACKEND", "thread")
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", "4"))
+
+# 이미지 캐시 설정 (IMAGE_CACHE_DIR 가 비어 있으면 디스크 계층 미사용)
+IMAGE_CACHE_MEMORY_BYTES = int(os.getenv("IMAGE_CACHE_MEMORY_MB", "256")) * 1024 * 1024
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "")
+IMAGE_CACHE_DISK_BYTES = int(os.getenv("IMAGE_CACHE_DISK_MB", "2048")) * 1024 * 1024
+IMAGE_CACHE_URL_TTL_SECONDS = float(os.getenv("IMAGE_CACHE_URL_TTL_SECONDS", "3600"))
+
+# 이미지 다운로드 클라이언트 설정 (앱 전체에서 aiohttp 세션 하나를 공유)
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", "100"))
+DOWNLOAD_MAX_CONNECTIONS_PER_HOST = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS_PER_HOST", "15"))
+DOWNLOAD_DNS_TTL_SECONDS = int(os.getenv("DOWNLOAD_DNS_TTL_SECONDS", "300"))
+DOWNLOAD_TOTAL_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TOTAL_TIMEOUT_SECONDS", "30"))
+DOWNLOAD_READ_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_READ_TIMEOUT_SECONDS", "10"))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_MB", "30")) * 1024 * 1024
+
+# 콜라주 인코딩 설정 ("jpeg" | "webp" | "png")
+COLLAGE_FORMAT = os.getenv("COLLAGE_FORMAT", "jpeg")
+COLLAGE_QUALITY = int(os.getenv("COLLAGE_QUALITY", "85"))
+COLLAGE_MIN_QUALITY = int(os.getenv("COLLAGE_MIN_QUALITY", "50"))
+# 요청 1건에서 전송하는 콜라주 전체 바이트 예산 (콜라주 수로 나눠 적용)
+COLLAGE_PAYLOAD_BUDGET_BYTES = int(os.getenv("COLLAGE_PAYLOAD_BUDGET_KB", "3072")) * 1024
+
+# 콜라주 배치 설정: 요청 1건의 이미지 토큰 예산 안에서 격자/셀 크기/콜라주 수를 고름
+COLLAGE_TOKEN_BUDGET = int(os.getenv("COLLAGE_TOKEN_BUDGET", "4000"))
+# 셀 크기 하한 (기존 4×4 콜라주가 provider 에서 줄어든 크기와 같음), 업로드 상한 셀 크기 (px)
+COLLAGE_MIN_CELL_PX = int(os.getenv("COLLAGE_MIN_CELL_PX", "192"))
+COLLAGE_MAX_CELL_PX = int(os.getenv("COLLAGE_MAX_CELL_PX", "400"))
+
+# 유사(near-duplicate) 이미지 묶기 설정 (dHash 64bit 기준 해밍 거리)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_HAMMING_THRESHOLD = int(os.getenv("DEDUP_HAMMING_THRESHOLD", "6"))
+
+# 모델에 보내는 최대 후보 수 (초과 시 로컬 품질 점수 상위만 전송)
+SCORER_MAX_CANDIDATES = int(os.getenv("SCORER_MAX_CANDIDATES", "48"))
+# LLM 선택 단계 제한 시간, 초과 시 로컬 선택으로 대체
+SCORER_LLM_DEADLINE_SECONDS = float(os.getenv("SCORER_LLM_DEADLINE_SECONDS", "60"))
+
+# 스코어링 모델 및 대형 앨범 토너먼트 설정
+SCORER_MODEL = os.getenv("SCORER_MODEL", "gpt-4.1")
+# 토너먼트는 후보가 100장 안팎 이상일 때만 단일 호출보다 빠르다 (48~64장에서는 오히려 느림).
+# 기본 후보 상한(48)에서는 이득이 없으므로 꺼 두고, 켤 때는 SCORER_MAX_CANDIDATES 도 함께 올린다.
+SCORER_TOURNAMENT_ENABLED = os.getenv("SCORER_TOURNAMENT_ENABLED", "false").lower() == "true"
+# 후보가 이 개수 이상이면 토너먼트 사용 (콜라주 한 장 최대 4x8=32칸을 넘는 경우, SCORER_MAX_CANDIDATES 이하여야 동작)
+SCORER_TOURNAMENT_MIN_CANDIDATES = int(os.getenv("SCORER_TOURNAMENT_MIN_CANDIDATES", "33"))
+# 1차 호출 하나가 담당하는 콜라주 수 (fan-out 폭)
+SCORER_FANOUT_COLLAGES = int(os.getenv("SCORER_FANOUT_COLLAGES", "1"))
+# 1차 shortlist 전체 목표 개수 (결승 콜라주 한 장 분량)
+SCORER_FINAL_CANDIDATES = int(os.getenv("SCORER_FINAL_CANDIDATES", "16"))
+
+# /score 결과 캐시 (앨범 내용 기준)
+SCORE_CACHE_TTL_SECONDS = float(os.getenv("SCORE_CACHE_TTL_SECONDS", "3600"))
+SCORE_CACHE_MAX_ENTRIES = int(os.getenv("SCORE_CACHE_MAX_ENTRIES", "1000"))
+
+# /score/batch 설정: 동시에 처리하는 앨범 수, 요청 1건의 최대 앨범 수
+SCORE_BATCH_CONCURRENCY = int(os.getenv("SCORE_BATCH_CONCURRENCY", "4"))
+SCORE_BATCH_MAX_ALBUMS = int(os.getenv("SCORE_BATCH_MAX_ALBUMS", "500"))
+
+# 비동기 job API 설정 (프로세스 내 worker 큐)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+# 완료된 job 상태 보관 기간/개수 (in-memory store)
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_MAX_ENTRIES = int(os.getenv("JOB_MAX_ENTRIES", "10000"))
+# SSE 구독 시 store 를 다시 읽는 주기
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "1"))
+
+# 일기 생성용 이미지 인코딩 설정 ("jpeg" | "webp" | "png")
+DIARY_IMAGE_FORMAT = os.getenv("DIARY_IMAGE_FORMAT", "jpeg")
+DIARY_IMAGE_QUALITY = int(os.getenv("DIARY_IMAGE_QUALITY", "80"))
+# 긴 변 기준 최대 크기 (원본이 더 작으면 그대로)
+DIARY_IMAGE_MAX_PX = int(os.getenv("DIARY_IMAGE_MAX_PX", "800"))
+# 키워드가 모두 이 목록에 속하는 사진은 detail="low" (512px, 고정 85 토큰) 로 전송 (쉼표 구분, 예: "풍경")
+DIARY_LOW_DETAIL_KEYWORDS = {k.strip() for k in os.getenv("DIARY_LOW_DETAIL_KEYWORDS", "").split(",") if k.strip()}
+
+# 일기 생성 응답 방식 ("structured": 일기+감정을 JSON 한 번에 | "two_call": 일기 생성 후 감정 분류 호출)
+DIARY_OUTPUT_MODE = os.getenv("DIARY_OUTPUT_MODE", "structured")
+
+# 문장 단위 부분 수정 시 수정 구간 앞뒤로 함께 보내는 문장 수
+MODIFY_CONTEXT_SENTENCES = int(os.getenv("MODIFY_CONTEXT_SENTENCES", "2"))
+
+# /generate, /modify 중복 요청 처리: 같은 키의 결과를 보관하는 기간/개수
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
@@ -0,0 +1,47 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from app.core.config import DECODE_BACKEND, DECODE_WORKERS
+from app.core.logger import logger
+
+# 앱 전체에서 공유하는 디코딩 executor (lifespan 에서 생성/종료)
+_executor: Optional[Executor] = None
+
+
+def create_executor(backend: str = DECODE_BACKEND, workers: int = DECODE_WORKERS) -> Executor:
+    """
+    process: GIL 과 무관하게 병렬 처리, 대신 이미지가 pickle 로 오간다.
+    thread : Pillow 가 decode/resize 중 GIL 을 놓기 때문에 대부분 충분히 병렬이고 복사 비용이 없다.
+    """
+    if backend == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if backend == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode")
+    raise ValueError(f"Unknown DECODE_BACKEND: {backend}")
+
+
+def init_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = create_executor()
+        logger.info(f"[executor] 생성: backend={DECODE_BACKEND}, workers={DECODE_WORKERS}")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+        logger.info("[executor] 종료")
+
+
+def get_executor() -> Executor:
+    # lifespan 밖(스크립트 등)에서 호출되면 지연 생성
+    return _executor or init_executor()
+
+
+async def run_in_executor(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), fn, *args)
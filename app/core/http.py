@@ -0,0 +1,111 @@
+import asyncio
+from typing import Dict, Optional
+
+import aiohttp
+
+from app.core.config import (
+    DOWNLOAD_MAX_CONNECTIONS,
+    DOWNLOAD_MAX_CONNECTIONS_PER_HOST,
+    DOWNLOAD_DNS_TTL_SECONDS,
+    DOWNLOAD_TOTAL_TIMEOUT_SECONDS,
+    DOWNLOAD_READ_TIMEOUT_SECONDS,
+    DOWNLOAD_MAX_BYTES,
+)
+from app.core.logger import logger
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+class DownloadClient:
+    """
+    앱 전체에서 공유하는 이미지 다운로드 클라이언트.
+    startup 때 세션을 한 번 만들어 커넥션(TLS) 과 DNS 조회 결과를 요청 간에 재사용한다.
+    """
+
+    def __init__(
+        self,
+        limit: int = DOWNLOAD_MAX_CONNECTIONS,
+        limit_per_host: int = DOWNLOAD_MAX_CONNECTIONS_PER_HOST,
+        dns_ttl: int = DOWNLOAD_DNS_TTL_SECONDS,
+        total_timeout: float = DOWNLOAD_TOTAL_TIMEOUT_SECONDS,
+        read_timeout: float = DOWNLOAD_READ_TIMEOUT_SECONDS,
+        max_bytes: int = DOWNLOAD_MAX_BYTES,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_read=read_timeout)
+        self.max_bytes = max_bytes
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._active = 0
+        self.counters = {
+            "requests": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "too_large": 0,
+            "bytes": 0,
+            "peak_active": 0,
+        }
+
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            logger.info(f"[download] 세션 생성: limit={self.limit}, per_host={self.limit_per_host}")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_bytes(self, url: str) -> bytes:
+        """url 의 본문을 max_bytes 이내로 읽어 반환한다. 오류 응답은 예외로 처리."""
+        if self._session is None or self._session.closed:
+            # lifespan 밖(스크립트 등)에서 호출된 경우
+            await self.start()
+        self.counters["requests"] += 1
+        self._active += 1
+        self.counters["peak_active"] = max(self.counters["peak_active"], self._active)
+        try:
+            async with self._session.get(url) as resp:
+                resp.raise_for_status()
+                if resp.content_length is not None and resp.content_length > self.max_bytes:
+                    raise ImageTooLargeError(f"{url}: {resp.content_length} bytes")
+                chunks = []
+                size = 0
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ImageTooLargeError(f"{url}: > {self.max_bytes} bytes")
+                    chunks.append(chunk)
+                self.counters["bytes"] += size
+                return b"".join(chunks)
+        except ImageTooLargeError:
+            self.counters["too_large"] += 1
+            raise
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+        finally:
+            self._active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "active": self._active,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "utilisation": round(self._active / self.limit, 3) if self.limit else 0,
+        }
+
+
+download_client = DownloadClient()
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS
+
+
+class IdempotencyConflictError(Exception):
+    """같은 idempotency key 로 다른 요청 본문이 들어온 경우"""
+
+
+class IdempotencyStore:
+    """
+    같은 키의 요청은 한 번만 실행한다.
+
+    - 실행 중인 키로 다시 들어오면 진행 중인 작업을 함께 기다림 (coalesced)
+    - store=True 인 요청(클라이언트가 키를 명시)의 성공 결과만 TTL 동안 보관했다가 그대로 돌려줌 (replayed)
+    - 실패는 보관하지 않으므로 재시도하면 새로 실행
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._results = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self.counters = {"executed": 0, "coalesced": 0, "replayed": 0, "conflicts": 0}
+
+    @staticmethod
+    def fingerprint(body: str) -> str:
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    async def run(
+        self, key: str, fingerprint: str, fn: Callable[[], Awaitable[Any]], store: bool = True,
+    ) -> Tuple[Any, str]:
+        """(결과, "executed" | "coalesced" | "replayed") 반환"""
+        stored = self._results.get(key)
+        if stored is not None:
+            self._check(fingerprint, stored[0])
+            self.counters["replayed"] += 1
+            return stored[1], "replayed"
+
+        entry = self._inflight.get(key)
+        if entry is None:
+            # 처음 요청한 클라이언트가 끊어도 재시도한 쪽을 위해 계속 진행
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = (fingerprint, task)
+            task.add_done_callback(lambda t: self._on_done(key, fingerprint, t, store))
+            outcome = "executed"
+        else:
+            self._check(fingerprint, entry[0])
+            task = entry[1]
+            outcome = "coalesced"
+        self.counters[outcome] += 1
+        return await asyncio.shield(task), outcome
+
+    def _check(self, fingerprint: str, expected: str) -> None:
+        if fingerprint != expected:
+            self.counters["conflicts"] += 1
+            raise IdempotencyConflictError()
+
+    def _on_done(self, key: str, fingerprint: str, task: asyncio.Future, store: bool) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or not store:
+            return
+        if task.exception() is None:
+            self._results.set(key, (fingerprint, task.result()))
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "inflight": len(self._inflight), "stored": self._results.stats()["entries"]}
+
+
+idempotency_store = IdempotencyStore(max_entries=IDEMPOTENCY_MAX_ENTRIES, ttl=IDEMPOTENCY_TTL_SECONDS)
+
+
+def idempotency_key(scope: str, header: Optional[str], body: str) -> str:
+    """
+    Idempotency-Key 헤더가 있으면 그 값, 없으면 요청 본문 해시로 키를 만든다 (엔드포인트별로 분리).
+    본문 해시 키는 동시에 진행 중인 중복 요청을 합치는 데만 쓰고 결과는 보관하지 않는다
+    (같은 입력으로 일부러 다시 생성하는 경우 새 결과를 받아야 하므로).
+    """
+    return f"{scope}:{header or IdempotencyStore.fingerprint(body)}"
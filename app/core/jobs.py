@@ -0,0 +1,215 @@
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import (
+    JOB_WORKERS,
+    JOB_QUEUE_MAX_SIZE,
+    JOB_TTL_SECONDS,
+    JOB_MAX_ENTRIES,
+    JOB_EVENTS_POLL_SECONDS,
+)
+from app.core.logger import logger
+from app.core.ratelimit import BATCH, request_priority
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+TERMINAL = (DONE, FAILED)
+
+# 작업 함수가 실행 중인 job id (서비스 코드는 report_progress 만 호출하면 됨)
+_current_job: ContextVar[Optional[str]] = ContextVar("current_job", default=None)
+
+
+class JobQueueFullError(RuntimeError):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = QUEUED
+    stage: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class JobStore(ABC):
+    """
+    job 상태 저장소 인터페이스.
+    여러 프로세스가 상태를 공유해야 하면 (Redis 등) 이 클래스를 구현해서 JobQueue 에 넘긴다.
+    """
+
+    @abstractmethod
+    async def save(self, job: Job) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    """프로세스 메모리에 보관 (기본값). 완료 후 TTL 이 지나거나 상한을 넘으면 오래된 것부터 삭제."""
+
+    def __init__(self, max_entries: int = JOB_MAX_ENTRIES, ttl: float = JOB_TTL_SECONDS):
+        self._jobs = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    async def save(self, job: Job) -> None:
+        self._jobs.set(job.id, job)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+
+JobFn = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue:
+    """
+    크기가 제한된 asyncio 큐 + 고정 개수 worker.
+    HTTP 요청은 job 을 넣고 바로 반환하고, 결과/진행 단계는 store 에 기록된다.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, max_size: int = JOB_QUEUE_MAX_SIZE):
+        self.store = store
+        self.workers = workers
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._watchers: Dict[str, asyncio.Event] = {}
+        self.counters = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0}
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"[job queue] 시작: workers={self.workers}, max_size={self.max_size}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        logger.info("[job queue] 종료")
+
+    async def submit(self, kind: str, fn: JobFn) -> Job:
+        if self._queue is None:
+            await self.start()
+        if self._queue.full():
+            self.counters["rejected"] += 1
+            raise JobQueueFullError("JOB_QUEUE_FULL")
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        job.events.append({"stage": QUEUED, "at": job.created_at})
+        # worker 가 꺼내기 전에 store 에 있어야 하므로 저장 후 큐에 넣음
+        await self.store.save(job)
+        try:
+            self._queue.put_nowait((job.id, fn))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            await self.record(job.id, FAILED, status=FAILED)
+            raise JobQueueFullError("JOB_QUEUE_FULL")
+        self.counters["submitted"] += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.store.get(job_id)
+
+    async def record(self, job_id: str, stage: str, status: Optional[str] = None, **detail) -> None:
+        job = await self.store.get(job_id)
+        if job is None:
+            return
+        job.stage = stage
+        job.status = status or job.status
+        job.updated_at = time.time()
+        job.events.append({"stage": stage, "at": job.updated_at, **detail})
+        await self.store.save(job)
+        self._notify(job_id)
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """지금까지의 이벤트를 보낸 뒤 새 이벤트를 기다려 보내고, 완료/실패 시 종료"""
+        sent = 0
+        while True:
+            # 상태를 읽기 전에 대기 이벤트를 먼저 잡아야 그 사이 알림을 놓치지 않음
+            changed = self._watchers.setdefault(job_id, asyncio.Event())
+            job = await self.store.get(job_id)
+            if job is None:
+                self._watchers.pop(job_id, None)
+                return
+            for event in job.events[sent:]:
+                yield event
+            sent = len(job.events)
+            if job.status in TERMINAL:
+                self._watchers.pop(job_id, None)
+                return
+            # 다른 프로세스가 갱신하는 store 도 있으므로 알림이 없어도 주기적으로 다시 읽음
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=JOB_EVENTS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "workers": len(self._tasks),
+        }
+
+    def _notify(self, job_id: str) -> None:
+        changed = self._watchers.pop(job_id, None)
+        if changed is not None:
+            changed.set()
+
+    async def _worker(self, worker_id: int) -> None:
+        # job 안의 LLM 호출은 대기열에서 사용자 요청 뒤로 보냄
+        request_priority.set(BATCH)
+        while True:
+            job_id, fn = await self._queue.get()
+            token = _current_job.set(job_id)
+            try:
+                await self.record(job_id, RUNNING, status=RUNNING)
+                result = await fn()
+                job = await self.store.get(job_id)
+                if job is not None:
+                    job.result = result
+                    await self.store.save(job)
+                await self.record(job_id, DONE, status=DONE)
+                self.counters["done"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[job 실패] {job_id}: {e!r}")
+                job = await self.store.get(job_id)
+                if job is not None:
+                    job.error = str(e) or type(e).__name__
+                    await self.store.save(job)
+                await self.record(job_id, FAILED, status=FAILED)
+                self.counters["failed"] += 1
+            finally:
+                _current_job.reset(token)
+                self._queue.task_done()
+
+
+job_queue = JobQueue(store=InMemoryJobStore())
+
+
+async def report_progress(stage: str, **detail) -> None:
+    """
+    서비스 코드에서 처리 단계를 알린다 (downloaded, decoded, collaged, model_call 등).
+    job worker 밖(일반 HTTP 요청)에서 호출되면 아무것도 하지 않는다.
+    """
+    job_id = _current_job.get()
+    if job_id is not None:
+        await job_queue.record(job_id, stage, **detail)
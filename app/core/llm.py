@@ -0,0 +1,562 @@
+import asyncio
+import base64
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+import google.generativeai as genai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from app.core.config import (
+    OPENAI_API_KEY,
+    GEMINI_MODEL,
+    LLM_PROVIDER,
+    LLM_TIMEOUT_SECONDS,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY_SECONDS,
+    LLM_STUB_LATENCY_SECONDS,
+    LLM_HEDGE_ROUTES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_WINDOW,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS,
+    LLM_HEDGE_OPENAI_MODEL,
+    LLM_RATE_OUTPUT_TOKENS,
+)
+from app.core import resilience
+from app.core.logger import logger
+from app.core.ratelimit import RateLimiter, get_limiter, request_priority
+
+# stub 스트리밍 시 한 번에 보내는 글자 수
+STUB_STREAM_CHUNK = 4
+
+# OpenAI Responses API 형식의 input (문자열 또는 message 리스트)
+LLMInput = Union[str, List[Dict[str, Any]]]
+
+
+@dataclass
+class LLMResult:
+    text: str
+    provider: str
+    model: str
+    usage: Dict[str, Any] = field(default_factory=dict)
+    latency: float = 0.0
+
+
+def input_text(input: LLMInput) -> str:
+    """message 안의 텍스트 파트만 이어붙여 반환"""
+    if isinstance(input, str):
+        return input
+    texts = []
+    for message in input:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content:
+            if part.get("type") == "input_text":
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def estimate_tokens(input: LLMInput) -> int:
+    """
+    TPM 예약용 토큰 예상치 (입력 + 예상 출력).
+    한국어가 섞인 텍스트는 대략 2글자당 1토큰, 이미지는 detail=low 85 / 그 외 765 토큰으로 계산.
+    """
+    tokens = len(input_text(input)) // 2 + LLM_RATE_OUTPUT_TOKENS
+    if not isinstance(input, str):
+        for message in input:
+            content = message.get("content", "")
+            if isinstance(content, str):
+                continue
+            for part in content:
+                if part.get("type") == "input_image":
+                    tokens += 85 if part.get("detail") == "low" else 765
+    return tokens
+
+
+def used_tokens(usage: Dict[str, Any]) -> int:
+    return (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+
+
+class OpenAIProvider:
+    """
+    AsyncOpenAI 클라이언트 하나를 프로세스 전체에서 공유한다.
+    httpx 커넥션 풀 + keep-alive 로 요청마다 TLS 핸드셰이크를 하지 않는다.
+    """
+    name = "openai"
+
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0),
+            )
+            # 재시도는 resilience.call 에서만 (SDK 자체 재시도와 겹치면 시도 횟수가 곱해짐)
+            self._client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, max_retries=0)
+        return self._client
+
+    def resolve_model(self, model: str) -> str:
+        return model
+
+    async def generate(self, model: str, input: LLMInput, **kwargs) -> LLMResult:
+        resp = await self.client.responses.create(model=model, input=input, **kwargs)
+        usage = resp.usage.model_dump() if resp.usage else {}
+        return LLMResult(text=resp.output_text, provider=self.name, model=model, usage=usage)
+
+    async def stream(self, model: str, input: LLMInput, **kwargs) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        events = await self.client.responses.create(model=model, input=input, stream=True, **kwargs)
+        async for event in events:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+            elif event.type == "response.completed" and event.response.usage:
+                # 마지막에 usage(dict) 를 넘겨 llm.stream 에서 집계
+                yield event.response.usage.model_dump()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+def json_schema_format(kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """OpenAI Responses API 의 text={"format": {"type": "json_schema", ...}} 옵션 (없으면 None)"""
+    text_format = (kwargs.get("text") or {}).get("format") or {}
+    return text_format if text_format.get("type") == "json_schema" else None
+
+
+# Gemini response_schema 가 받는 JSON schema 키 (additionalProperties/strict 등은 지원하지 않음)
+GEMINI_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+def to_gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    converted = {}
+    for key, value in schema.items():
+        if key not in GEMINI_SCHEMA_KEYS:
+            continue
+        if key == "properties":
+            value = {name: to_gemini_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            value = to_gemini_schema(value)
+        converted[key] = value
+    if "enum" in converted and converted.get("type") == "string":
+        converted["format"] = "enum"
+    return converted
+
+
+class GeminiProvider:
+    """
+    google-generativeai 의 async API (grpc_asyncio 채널 공유) 를 사용한다.
+    OpenAI 형식의 input 을 Gemini contents 로 변환해서 호출한다.
+    """
+    name = "gemini"
+
+    def __init__(self):
+        self._models: Dict[str, genai.GenerativeModel] = {}
+
+    def resolve_model(self, model: str) -> str:
+        # OpenAI 모델명이 넘어오면 기본 Gemini 모델을 사용
+        return model if model.startswith(("models/", "gemini")) else GEMINI_MODEL
+
+    def _model(self, model: str) -> genai.GenerativeModel:
+        model = self.resolve_model(model)
+        if model not in self._models:
+            self._models[model] = genai.GenerativeModel(model)
+        return self._models[model]
+
+    @staticmethod
+    def to_contents(input: LLMInput) -> List[Dict[str, Any]]:
+        if isinstance(input, str):
+            return [{"role": "user", "parts": [{"text": input}]}]
+        contents = []
+        for message in input:
+            content = message.get("content", "")
+            if isinstance(content, str):
+                contents.append({"role": "user", "parts": [{"text": content}]})
+                continue
+            parts = []
+            for part in content:
+                if part.get("type") == "input_text":
+                    parts.append({"text": part["text"]})
+                elif part.get("type") == "input_image":
+                    # data:image/png;base64,.... 형식
+                    header, data = part["image_url"].split(",", 1)
+                    mime_type = header[len("data:"):].split(";", 1)[0]
+                    parts.append({"inline_data": {"mime_type": mime_type, "data": base64.b64decode(data)}})
+            contents.append({"role": "user", "parts": parts})
+        return contents
+
+    async def generate(self, model: str, input: LLMInput, **kwargs) -> LLMResult:
+        gemini_model = self._model(model)
+        generation_config = None
+        text_format = json_schema_format(kwargs)
+        if text_format is not None:
+            # OpenAI structured output 옵션을 Gemini JSON 응답 설정으로 변환 (hedge 시 같은 형식의 응답을 받기 위함)
+            generation_config = {
+                "response_mime_type": "application/json",
+                "response_schema": to_gemini_schema(text_format["schema"]),
+            }
+        resp = await gemini_model.generate_content_async(self.to_contents(input), generation_config=generation_config)
+        return LLMResult(text=resp.text, provider=self.name, model=gemini_model.model_name, usage=self._usage(resp))
+
+    @staticmethod
+    def _usage(resp) -> Dict[str, Any]:
+        # OpenAI usage 와 같은 형태로 맞춤 (cached_tokens 는 implicit/explicit context cache 적중분)
+        metadata = getattr(resp, "usage_metadata", None)
+        if not metadata:
+            return {}
+        return {
+            "input_tokens": metadata.prompt_token_count,
+            "output_tokens": metadata.candidates_token_count,
+            "input_tokens_details": {"cached_tokens": getattr(metadata, "cached_content_token_count", 0) or 0},
+        }
+
+    async def stream(self, model: str, input: LLMInput, **kwargs) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        resp = await self._model(model).generate_content_async(self.to_contents(input), stream=True)
+        last = None
+        async for chunk in resp:
+            last = chunk
+            if chunk.text:
+                yield chunk.text
+        if last is not None and self._usage(last):
+            yield self._usage(last)
+
+    async def aclose(self):
+        self._models.clear()
+
+
+def _default_stub_reply(prompt: str) -> str:
+    if "[final output]" in prompt:
+        # 번호 범위가 주어지면 그 범위 안에서 앞쪽 번호를 고름
+        match = re.search(r"numbers in this request range from (\d+) to (\d+)", prompt)
+        first, last = (int(match.group(1)), int(match.group(2))) if match else (1, 9)
+        count_match = re.search(r"exactly \*\*(\d+) images", prompt)
+        count = int(count_match.group(1)) if count_match else 9
+        numbers = range(first, min(last, first + count - 1) + 1)
+        return "[thinking]\n#1: good\n[final output]\n" + ", ".join(str(i) for i in numbers)
+    if '<EDIT id="' in prompt:
+        # 부분 수정 요청: 요청에 있는 블록 id 마다 수정 문장을 돌려줌
+        ids = sorted(set(re.findall(r'<EDIT id="(\d+)">', prompt)), key=int)
+        edits = "".join(f'<EDIT id="{i}">\n수정된 문장이다.\n</EDIT>\n' for i in ids)
+        return edits + "\n<EMOTION>\nhappy\n</EMOTION>"
+    if "<DIARY>" in prompt:
+        return "<DIARY>\n오늘은 정말 즐거운 하루였다.\n</DIARY>\n\n<EMOTION>\nhappy\n</EMOTION>"
+    if "Respond with only the label" in prompt:
+        return "good"
+    return "오늘은 정말 즐거운 하루였다."
+
+
+def _stub_structured_reply(schema: Dict[str, Any], prompt: str) -> str:
+    """json_schema 형식 요청에는 스키마에 맞는 JSON 을 돌려준다 (enum 은 첫 값)."""
+    reply = {}
+    for name, prop in schema.get("properties", {}).items():
+        if "enum" in prop:
+            reply[name] = prop["enum"][0]
+        else:
+            reply[name] = _default_stub_reply(prompt)
+    return json.dumps(reply, ensure_ascii=False)
+
+
+class StubProvider:
+    """
+    네트워크 호출 없이 고정 지연 후 응답하는 로컬 provider.
+    벤치마크/로컬 개발용 (LLM_PROVIDER=stub).
+    """
+    name = "stub"
+
+    def __init__(self, latency: float = LLM_STUB_LATENCY_SECONDS, reply: Callable[[str], str] = _default_stub_reply):
+        self.latency = latency
+        self.reply = reply
+
+    def resolve_model(self, model: str) -> str:
+        return model
+
+    async def generate(self, model: str, input: LLMInput, **kwargs) -> LLMResult:
+        await asyncio.sleep(self.latency)
+        text_format = kwargs.get("text", {}).get("format", {})
+        if text_format.get("type") == "json_schema":
+            text = _stub_structured_reply(text_format["schema"], input_text(input))
+        else:
+            text = self.reply(input_text(input))
+        return LLMResult(text=text, provider=self.name, model=model)
+
+    async def stream(self, model: str, input: LLMInput, **kwargs) -> AsyncIterator[str]:
+        # 첫 토큰까지 지연의 20%, 나머지는 조각마다 나눠서 보냄
+        text = self.reply(input_text(input))
+        chunks = [text[i:i + STUB_STREAM_CHUNK] for i in range(0, len(text), STUB_STREAM_CHUNK)] or [""]
+        await asyncio.sleep(self.latency * 0.2)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(self.latency * 0.8 / max(1, len(chunks) - 1))
+            yield chunk
+
+    async def aclose(self):
+        pass
+
+
+_PROVIDERS = {
+    "openai": OpenAIProvider(),
+    "gemini": GeminiProvider(),
+    "stub": StubProvider(),
+}
+
+
+# provider/model 별 토큰 사용량 (prompt cache 적중률 확인용)
+_usage: Dict[str, Dict[str, int]] = {}
+
+
+def cached_tokens(usage: Dict[str, Any]) -> int:
+    details = usage.get("input_tokens_details") or {}
+    return details.get("cached_tokens") or 0
+
+
+def record_usage(provider: str, model: str, usage: Dict[str, Any]) -> None:
+    stats = _usage.setdefault(
+        f"{provider}/{model}", {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0},
+    )
+    stats["calls"] += 1
+    stats["input_tokens"] += usage.get("input_tokens") or 0
+    stats["cached_tokens"] += cached_tokens(usage)
+    stats["output_tokens"] += usage.get("output_tokens") or 0
+
+
+def usage_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        key: {**stats, "cache_hit_rate": round(stats["cached_tokens"] / stats["input_tokens"], 4) if stats["input_tokens"] else 0.0}
+        for key, stats in _usage.items()
+    }
+
+
+def register_provider(name: str, provider) -> None:
+    """provider 교체 (벤치마크에서 stub 지연을 바꿀 때 등)"""
+    _PROVIDERS[name] = provider
+
+
+def get_provider(name: Optional[str] = None):
+    name = name or LLM_PROVIDER
+    if name not in _PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {name}")
+    return _PROVIDERS[name]
+
+
+# provider/model 별 최근 응답 지연 (hedge 기준 시간 계산용)
+_latencies: Dict[str, deque] = {}
+_hedge_counters: Dict[str, Any] = {"hedged": 0, "wins": {}}
+
+
+def record_latency(provider: str, model: str, seconds: float) -> None:
+    _latencies.setdefault(f"{provider}/{model}", deque(maxlen=LLM_HEDGE_WINDOW)).append(seconds)
+
+
+def hedge_delay(provider: str, model: str) -> float:
+    """최근 지연의 LLM_HEDGE_PERCENTILE 값 (표본이 부족하면 기본값)"""
+    samples = _latencies.get(f"{provider}/{model}")
+    if not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE / 100))]
+
+
+def hedge_target(provider: str, kwargs: Dict[str, Any]) -> Optional[str]:
+    """
+    보조 provider 이름 (LLM_HEDGE_ROUTES 에 경로가 있을 때만).
+    추가 옵션은 provider 마다 달라서 옵션이 없거나 양쪽이 모두 지원하는 structured output(json_schema) 만 hedge.
+    """
+    if kwargs and (set(kwargs) != {"text"} or json_schema_format(kwargs) is None):
+        return None
+    target = LLM_HEDGE_ROUTES.get(provider)
+    return target if target in _PROVIDERS and target != provider else None
+
+
+def hedge_model(provider: str, model: str) -> str:
+    # 상대 provider 의 모델명은 쓸 수 없으므로 각 provider 의 대체 모델 사용
+    if provider == "openai" and model.startswith(("models/", "gemini")):
+        return LLM_HEDGE_OPENAI_MODEL
+    return get_provider(provider).resolve_model(model)
+
+
+def hedge_stats() -> Dict[str, Any]:
+    return {
+        "routes": dict(LLM_HEDGE_ROUTES),
+        "hedged": _hedge_counters["hedged"],
+        "wins": dict(_hedge_counters["wins"]),
+        "delays": {
+            key: round(hedge_delay(*key.split("/", 1)), 3) for key in _latencies
+        },
+    }
+
+
+async def _admit(llm, model: str, input: LLMInput) -> Tuple[RateLimiter, int]:
+    """provider/model 별 RPM/TPM 안에서 차례가 올 때까지 대기. (limiter, 예약 토큰 수) 반환"""
+    limiter = get_limiter(llm.name, model)
+    reserved = estimate_tokens(input)
+    await limiter.acquire(reserved, request_priority.get())
+    return limiter, reserved
+
+
+async def _timed_generate(llm, model: str, input: LLMInput, admitted=None, **kwargs) -> LLMResult:
+    """일시적 오류는 재시도 (resilience.call). 재시도마다 RPM/TPM 차례를 다시 받는다."""
+    async def attempt() -> LLMResult:
+        nonlocal admitted
+        # 대기열 시간은 provider 지연 기록에서 제외
+        limiter, reserved = admitted or await _admit(llm, model, input)
+        admitted = None
+        start = time.perf_counter()
+        result = await llm.generate(model, input, **kwargs)
+        record_latency(llm.name, model, time.perf_counter() - start)
+        if result.usage:
+            limiter.settle(reserved, used_tokens(result.usage))
+        return result
+
+    try:
+        return await resilience.call(llm.name, model, attempt)
+    finally:
+        if admitted is not None:
+            # circuit open 등으로 한 번도 호출하지 못했으면 미리 받은 차례를 반납
+            limiter, reserved = admitted
+            limiter.release(reserved)
+
+
+async def _hedged_generate(llm, backup, model: str, input: LLMInput, **kwargs) -> LLMResult:
+    """
+    주 provider 가 hedge_delay 안에 응답하지 않으면 보조 provider 에도 같은 요청을 보내고
+    먼저 성공한 응답을 사용한다. 남은 요청은 취소한다.
+    """
+    # 대기열에서 기다린 시간으로 hedge 하지 않도록 주 요청이 차례를 받은 뒤부터 시간을 잼
+    admitted = await _admit(llm, model, input)
+    delay = hedge_delay(llm.name, model)
+    start = time.perf_counter()
+    primary = asyncio.ensure_future(_timed_generate(llm, model, input, admitted, **kwargs))
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return primary.result()
+
+        _hedge_counters["hedged"] += 1
+        logger.info(f"[LLM hedge] {llm.name}/{model} {delay:.2f}s 초과 → {backup.name} 에도 요청")
+        secondary = asyncio.ensure_future(_timed_generate(backup, hedge_model(backup.name, model), input, **kwargs))
+        tasks.add(secondary)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    result = task.result()
+                    wins = _hedge_counters["wins"]
+                    wins[result.provider] = wins.get(result.provider, 0) + 1
+                    logger.info(f"[LLM hedge] {result.provider} 응답 사용")
+                    return result
+                logger.warning(f"[LLM hedge] {'주' if task is primary else '보조'} 요청 실패: {task.exception()!r}")
+        # 둘 다 실패하면 주 provider 오류를 그대로 전달 (API 오류 코드 매핑 유지)
+        raise primary.exception()
+    finally:
+        if not primary.done():
+            # 취소된 주 요청은 최소한 지금까지 걸린 시간만큼은 느렸으므로 지연 분포에 반영
+            record_latency(llm.name, model, time.perf_counter() - start)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def _rerouted_generate(llm, backup, model: str, input: LLMInput, **kwargs) -> LLMResult:
+    logger.warning(f"[LLM 우회] {llm.name}/{model} circuit open → {backup.name}")
+    return await _timed_generate(backup, hedge_model(backup.name, model), input, **kwargs)
+
+
+async def generate(model: str, input: LLMInput, provider: Optional[str] = None, **kwargs) -> LLMResult:
+    """
+    모든 서비스의 LLM 호출 진입점.
+    이벤트 루프를 막지 않으므로 한 worker 가 여러 요청을 동시에 처리할 수 있다.
+    """
+    llm = get_provider(provider)
+    # 실제로 호출되는 모델명으로 통일해야 RPM/TPM, circuit, 지연 기록이 같은 키로 모임
+    model = llm.resolve_model(model)
+    backup = hedge_target(llm.name, kwargs)
+    start = time.perf_counter()
+    if backup is None:
+        result = await _timed_generate(llm, model, input, **kwargs)
+    elif resilience.is_blocked(llm.name, model):
+        # 주 provider circuit 이 열려 있으면 기다리지 않고 보조 provider 로 바로 보냄
+        # (시험 호출 차례가 되면 is_blocked 가 False 라 주 provider 로 가서 circuit 을 닫을 기회를 줌)
+        result = await _rerouted_generate(llm, get_provider(backup), model, input, **kwargs)
+    else:
+        try:
+            result = await _hedged_generate(llm, get_provider(backup), model, input, **kwargs)
+        except resilience.CircuitOpenError:
+            # 시험 호출을 다른 요청이 먼저 가져갔거나 재시도 중 circuit 이 열린 경우
+            result = await _rerouted_generate(llm, get_provider(backup), model, input, **kwargs)
+    result.latency = time.perf_counter() - start
+    record_usage(result.provider, result.model, result.usage)
+    logger.info(
+        f"[LLM 응답] provider={result.provider} model={result.model} latency={result.latency:.2f}s "
+        f"input_tokens={result.usage.get('input_tokens', 0)} cached_tokens={cached_tokens(result.usage)}"
+    )
+    return result
+
+
+async def stream(model: str, input: LLMInput, provider: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+    """
+    generate 의 스트리밍 버전. 텍스트 조각을 생성되는 대로 yield 한다.
+    첫 조각을 받기 전의 일시적 오류만 재시도한다 (이미 보낸 조각은 되돌릴 수 없음).
+    """
+    llm = get_provider(provider)
+    model = llm.resolve_model(model)
+    start = time.perf_counter()
+
+    async def open_stream():
+        nonlocal start
+        limiter, reserved = await _admit(llm, model, input)
+        start = time.perf_counter()
+        deltas = llm.stream(model, input, **kwargs)
+        try:
+            first = await deltas.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await deltas.aclose()
+            raise
+        return limiter, reserved, deltas, first
+
+    limiter, reserved, deltas, first = await resilience.call(llm.name, model, open_stream)
+    first_token = None
+    try:
+        delta = first
+        while delta is not None:
+            if isinstance(delta, dict):
+                record_usage(llm.name, model, delta)
+                limiter.settle(reserved, used_tokens(delta))
+            else:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                yield delta
+            delta = await anext(deltas, None)
+    except Exception as e:
+        if resilience.is_transient(e):
+            resilience.get_breaker(llm.name, model).on_failure()
+        raise
+    finally:
+        await deltas.aclose()
+    logger.info(
+        f"[LLM 스트림] provider={llm.name} model={model} "
+        f"first_token={first_token or 0:.2f}s total={time.perf_counter() - start:.2f}s"
+    )
+
+
+async def aclose() -> None:
+    for provider in _PROVIDERS.values():
+        await provider.aclose()
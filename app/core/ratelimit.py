@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from app.core.config import (
+    LLM_DEFAULT_RPM,
+    LLM_DEFAULT_TPM,
+    LLM_RATE_LIMITS,
+    LLM_RATE_MAX_WAITERS,
+    LLM_RATE_MAX_WAIT_SECONDS,
+)
+
+# 요청 우선순위 (작을수록 먼저). 배치/비동기 job 은 BATCH 로 설정해 사용자 요청 뒤로 보냄
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+request_priority: ContextVar[int] = ContextVar("llm_request_priority", default=INTERACTIVE)
+
+
+class RateLimitExceededError(Exception):
+    """대기열이 가득 찼거나 최대 대기 시간 안에 차례가 오지 않은 경우"""
+
+
+class TokenBucket:
+    """분당 per_minute 만큼 채워지는 버킷 (최대 1분치까지 누적). per_minute <= 0 이면 제한 없음."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.per_minute, self.level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """amount 를 꺼낼 수 있을 때까지 남은 시간 (1분치보다 큰 요청은 1분치로 간주)"""
+        if self.per_minute <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.per_minute)
+        return 0.0 if self.level >= amount else (amount - self.level) * 60 / self.per_minute
+
+    def take(self, amount: float) -> None:
+        if self.per_minute > 0:
+            self._refill()
+            self.level -= min(amount, self.per_minute)
+
+    def adjust(self, amount: float) -> None:
+        """예약량과 실제 사용량 차이 보정 (양수면 추가 차감, 음수면 반환)"""
+        if self.per_minute > 0:
+            self._refill()
+            self.level = min(self.per_minute, self.level - amount)
+
+
+class RateLimiter:
+    """
+    provider/model 하나의 RPM/TPM 제한.
+
+    버킷이 비면 요청을 거절하지 않고 우선순위 대기열에 넣었다가 채워지는 대로 보낸다.
+    같은 우선순위 안에서는 도착 순서를 지킨다.
+    """
+
+    def __init__(self, rpm: int, tpm: int, max_waiters: int, max_wait: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+        self._waiters: List[tuple] = []  # (priority, seq, future, cost)
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.counters = {"admitted": 0, "released": 0, "queued": 0, "rejected": 0, "timeouts": 0, "peak_waiting": 0}
+        self.wait_seconds = 0.0
+
+    async def acquire(self, cost: int, priority: int = INTERACTIVE) -> None:
+        if not self._waiters and self._ready(cost):
+            self._take(cost)
+            return
+        if len(self._waiters) >= self.max_waiters:
+            self.counters["rejected"] += 1
+            raise RateLimitExceededError(f"대기열 초과 ({len(self._waiters)})")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, cost))
+        self.counters["queued"] += 1
+        self.counters["peak_waiting"] = max(self.counters["peak_waiting"], len(self._waiters))
+        start = time.monotonic()
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise RateLimitExceededError(f"{self.max_wait:.0f}s 대기 초과")
+        finally:
+            self.wait_seconds += time.monotonic() - start
+            if not future.done() or future.cancelled():
+                # 대기를 포기한 요청은 건너뛰고 다음 요청 차례를 다시 계산
+                future.cancel()
+                self._dispatch()
+
+    def settle(self, reserved: int, used: int) -> None:
+        """응답 후 실제 토큰 사용량으로 TPM 버킷 보정"""
+        self.tokens.adjust(used - reserved)
+
+    def release(self, reserved: int) -> None:
+        """차례를 받았지만 호출하지 못한 요청(circuit open 등)의 RPM/TPM 예약을 돌려줌"""
+        self.requests.adjust(-1)
+        self.tokens.adjust(-reserved)
+        self.counters["released"] += 1
+        self._dispatch()
+
+    def _ready(self, cost: int) -> bool:
+        return self.requests.wait_time(1) <= 0 and self.tokens.wait_time(cost) <= 0
+
+    def _take(self, cost: int) -> None:
+        self.requests.take(1)
+        self.tokens.take(cost)
+        self.counters["admitted"] += 1
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            _, _, future, cost = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(cost))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._take(cost)
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future, _ in self._waiters:
+            if not future.done():
+                waiting[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        return {
+            "rpm": self.requests.per_minute,
+            "tpm": self.tokens.per_minute,
+            "waiting": waiting,
+            **self.counters,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_limiter(provider: str, model: str) -> RateLimiter:
+    key = f"{provider}/{model}"
+    limiter = _limiters.get(key)
+    if limiter is None:
+        rpm, tpm = LLM_RATE_LIMITS.get(key, (LLM_DEFAULT_RPM, LLM_DEFAULT_TPM))
+        limiter = _limiters[key] = RateLimiter(rpm, tpm, LLM_RATE_MAX_WAITERS, LLM_RATE_MAX_WAIT_SECONDS)
+    return limiter
+
+
+def set_limits(provider: str, model: str, rpm: int, tpm: int) -> None:
+    """제한 교체 (벤치마크 등)"""
+    _limiters[f"{provider}/{model}"] = RateLimiter(rpm, tpm, LLM_RATE_MAX_WAITERS, LLM_RATE_MAX_WAIT_SECONDS)
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    return {key: limiter.stats() for key, limiter in _limiters.items()}
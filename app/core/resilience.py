@@ -0,0 +1,167 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import openai
+from google.api_core import exceptions as google_exceptions
+
+from app.core.config import (
+    LLM_RETRY_MAX_ATTEMPTS,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_BACKOFF_SECONDS,
+    LLM_RETRY_BUDGET_SECONDS,
+    LLM_BREAKER_FAILURE_THRESHOLD,
+    LLM_BREAKER_RESET_SECONDS,
+)
+from app.core.logger import logger
+
+CLOSED = "closed"
+OPEN = "open"
+
+# 호출자가 정한 마감 시각 (time.monotonic 기준). 재시도 대기가 이 시각을 넘으면 재시도하지 않음
+call_deadline: ContextVar[Optional[float]] = ContextVar("llm_call_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """provider/model 의 circuit 이 열려 있어 호출하지 않은 경우"""
+
+
+@contextmanager
+def deadline(seconds: float):
+    """이 블록 안의 LLM 호출은 seconds 안에 끝나도록 재시도를 제한 (이미 더 이른 마감이 있으면 유지)"""
+    until = time.monotonic() + seconds
+    current = call_deadline.get()
+    token = call_deadline.set(until if current is None else min(current, until))
+    try:
+        yield
+    finally:
+        call_deadline.reset(token)
+
+
+def is_transient(e: BaseException) -> bool:
+    """재시도하면 성공할 수 있는 오류 (연결 실패/타임아웃/5xx)"""
+    if isinstance(e, openai.APIConnectionError):
+        return True
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code >= 500
+    return isinstance(e, google_exceptions.ServerError)
+
+
+def is_provider_response(e: BaseException) -> bool:
+    """provider 가 정상적으로 응답한 오류 (4xx). 로컬 대기열 거절/파싱 오류 등은 해당하지 않음"""
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code < 500
+    return isinstance(e, google_exceptions.ClientError)
+
+
+def backoff(attempt: int) -> float:
+    """attempt 번째 재시도 전 대기 시간 (full jitter)"""
+    return random.uniform(0, min(LLM_RETRY_MAX_BACKOFF_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 failure_threshold 번이면 열려서 호출을 바로 거절한다.
+    열린 뒤 reset_seconds 가 지날 때마다 한 건만 시험 호출을 허용하고, 성공하면 닫힌다.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self.counters = {"retries": 0, "gave_up": 0, "opened": 0, "short_circuited": 0}
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at >= self.reset_seconds:
+            # 시험 호출 한 건 (다음 시험은 다시 reset_seconds 뒤)
+            self._opened_at = now
+            return True
+        self.counters["short_circuited"] += 1
+        return False
+
+    def blocked(self) -> bool:
+        """allow() 가 거절할 상태인지 (시험 호출 기회는 소비하지 않음)"""
+        return self.state == OPEN and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def on_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+
+    def on_failure(self) -> bool:
+        """실패 기록. 이번 실패로 circuit 이 열렸으면 True"""
+        self.failures += 1
+        if self.state == OPEN:
+            self._opened_at = time.monotonic()
+            return False
+        if self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self.counters["opened"] += 1
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, **self.counters}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(provider: str, model: str) -> CircuitBreaker:
+    key = f"{provider}/{model}"
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+    return breaker
+
+
+def is_blocked(provider: str, model: str) -> bool:
+    """circuit 이 열려 있고 아직 시험 호출 차례도 아님 (호출하면 바로 CircuitOpenError)"""
+    breaker = _breakers.get(f"{provider}/{model}")
+    return breaker is not None and breaker.blocked()
+
+
+def resilience_stats() -> Dict[str, Dict[str, Any]]:
+    return {key: breaker.stats() for key, breaker in _breakers.items()}
+
+
+async def call(provider: str, model: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    circuit breaker + 재시도로 fn() 실행.
+    일시적 오류는 LLM_RETRY_MAX_ATTEMPTS 번까지, 마감 시각(call_deadline 또는 LLM_RETRY_BUDGET_SECONDS) 안에서만 재시도한다.
+    """
+    breaker = get_breaker(provider, model)
+    until = call_deadline.get() or time.monotonic() + LLM_RETRY_BUDGET_SECONDS
+    attempt = 1
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{provider}/{model}")
+        try:
+            result = await fn()
+        except Exception as e:
+            if not is_transient(e):
+                # 4xx 는 provider 가 응답한 것이므로 성공으로 반영. 로컬 오류는 provider 상태를 알 수 없으므로 그대로 둠
+                if is_provider_response(e):
+                    breaker.on_success()
+                raise
+            if breaker.on_failure():
+                logger.error(f"[circuit open] {provider}/{model} 연속 {breaker.failures}회 실패, {breaker.reset_seconds:.0f}s 동안 호출 중단")
+            delay = backoff(attempt)
+            if attempt >= LLM_RETRY_MAX_ATTEMPTS or time.monotonic() + delay >= until:
+                breaker.counters["gave_up"] += 1
+                raise
+            breaker.counters["retries"] += 1
+            logger.warning(f"[LLM 재시도] {provider}/{model} {attempt}회 실패 ({e!r}), {delay:.2f}s 후 재시도")
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        breaker.on_success()
+        return result
@@ -1,8 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import diary, image_scorer, core
+from app.api import diary, image_scorer, core, jobs
+from app.core import llm
+from app.core.executor import init_executor, shutdown_executor
+from app.core.http import download_client
+from app.core.jobs import job_queue
 import logging
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 요청마다 pool 을 만들지 않도록 디코딩 executor 를 한 번만 생성
+    init_executor()
+    # 이미지 다운로드 세션도 앱 전체에서 하나만 사용
+    await download_client.start()
+    # 비동기 job worker 시작 (종료 시 진행 중인 job 은 취소)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await download_client.close()
+    shutdown_executor()
+    # 공유 LLM 커넥션 풀 정리
+    await llm.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 logging.basicConfig(level=logging.INFO)
 # 라우터 등록
@@ -10,4 +32,5 @@ logging.basicConfig(level=logging.INFO)
 # 라우터 등록
 app.include_router(diary.router, tags=["Diary"])
 app.include_router(image_scorer.router, tags=["Image Scorer"])
-app.include_router(core.router, tags=["check-health"])
\ No newline at end of file
+app.include_router(jobs.router, tags=["Jobs"])
+app.include_router(core.router, tags=["check-health"])
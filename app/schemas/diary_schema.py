@@ -23,3 +23,5 @@ class DiaryModifyRequest(BaseModel):
     user_speech: str = Field(..., alias="userSpeech")
     diary: str
     user_request: str = Field(..., alias="userRequest")
+    # 수정할 문장 번호 (1부터). 주어지면 해당 문장과 주변 문맥만 보내서 부분 수정
+    modify_lines: Optional[List[int]] = Field(None, alias="modifyLines")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl
-from typing import List, Union
+from typing import List, Literal, Optional, Union
 
 
 class PhotoInput(BaseModel):
@@ -9,6 +9,20 @@ class PhotoInput(BaseModel):
 class ImageScoringRequest(BaseModel):
     images: List[PhotoInput]
     reference_images: List[PhotoInput]
+    # "local" 이면 LLM 없이 로컬 특징(품질 + 다양성)만으로 선택
+    mode: Literal["llm", "local"] = "llm"
 
 class ImageScoringResponse(BaseModel):
-    recommendedPhotoIds: List[Union[int, str]]
\ No newline at end of file
+    recommendedPhotoIds: List[Union[int, str]]
+
+class AlbumScoringRequest(ImageScoringRequest):
+    albumId: Union[int, str]
+
+class ImageScoringBatchRequest(BaseModel):
+    albums: List[AlbumScoringRequest]
+
+class AlbumScoringResult(BaseModel):
+    albumId: Union[int, str]
+    recommendedPhotoIds: List[Union[int, str]]
+    # 앨범 처리 중 예외가 나면 오류 코드, 정상이면 None
+    error: Optional[str] = None
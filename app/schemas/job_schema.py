@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+
+class JobCreatedResponse(BaseModel):
+    jobId: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    jobId: str
+    kind: str
+    status: str
+    # 마지막으로 보고된 처리 단계 (queued, running, downloaded, decoded, collaged, model_call, done, failed)
+    stage: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    events: List[Dict[str, Any]]
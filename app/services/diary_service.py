@@ -1,26 +1,77 @@
+import asyncio
+import json
+import re
 import openai
-import os
 import base64
-import requests
-import io
-from PIL import Image
+import struct
 from dotenv import load_dotenv
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from app.schemas.diary_schema import DiaryRequest, DiaryResponse, PhotoItem, DiaryModifyRequest
 from app.core.logger import logger
-from app.core.config import client, model
-from app.utils.diary_utils import mark_by_sentence_indices
+from app.core.config import (
+    DIARY_IMAGE_FORMAT,
+    DIARY_IMAGE_QUALITY,
+    DIARY_IMAGE_MAX_PX,
+    DIARY_LOW_DETAIL_KEYWORDS,
+    DIARY_OUTPUT_MODE,
+    MODIFY_CONTEXT_SENTENCES,
+)
+from app.core import llm
+from app.core.executor import run_in_executor
+from app.core.http import download_client
+from app.core.jobs import report_progress
+from app.core.ratelimit import RateLimitExceededError
+from app.core.resilience import CircuitOpenError
+from app.utils.diary_utils import SentenceIndex, TaggedSectionStream, group_consecutive
+from app.utils.image_cache import image_cache
+from app.utils.image_utils import EncodedImage, encode_reduced
+from app.utils.layout_utils import estimate_image_tokens
+from app.utils.prompt_utils import PromptTemplate
 
 import random
 
 load_dotenv()
 
+DIARY_MODEL = "gpt-4.1"
+EMOTION_MODEL = "gpt-4.1-nano"
+MODIFY_MODEL = "gpt-5.1"
+
 EMOTION_EMOJI_MAP = {
             "special" :  ["love",  "proud", "sneaky"],
             "good" : ["smile", "happy", "cool"],
             "bad" : ["annoyed", "angry", "depression"]
         }
 
+# 일기와 감정 라벨을 한 번의 호출로 받기 위한 structured output 형식 (라벨은 EMOTION_EMOJI_MAP 의 키로 제한)
+DIARY_OUTPUT_FORMAT = {
+    "type": "json_schema",
+    "name": "diary_entry",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "diary": {"type": "string"},
+            "emotion": {"type": "string", "enum": list(EMOTION_EMOJI_MAP)},
+        },
+        "required": ["diary", "emotion"],
+        "additionalProperties": False,
+    },
+}
+
+STRUCTURED_OUTPUT_INSTRUCTIONS = """
+<Emotion Classification>
+After writing the diary, classify its overall emotional outcome.
+Focus on what actually happened and its emotional impact, rather than the tone of expression.
+- **special** – something specially positive or satisfying happened (e.g., a fun event, a beautiful view)
+- **good** – generally positive or pleasant
+- **bad** – something negative, upsetting, or frustrating happened
+
+<Structured Output>
+Return a JSON object with:
+- "diary": the diary entry, following the <Output Format> rules above
+- "emotion": exactly one of "special", "good", "bad"
+"""
+
 def pick_emoji_by_emotion(emotion_label: str) -> list[str]:
     candidates = EMOTION_EMOJI_MAP.get(emotion_label, [])
     if not candidates:
@@ -28,37 +79,85 @@ def pick_emoji_by_emotion(emotion_label: str) -> list[str]:
     return random.sample(candidates, 1)[0]
 
 
-async def convert_image_to_base64(image_path: str, target_width: int = 800) -> str:
-    """
-    Resize the image to target_width while maintaining aspect ratio,
-    then convert it to a base64 string.
-    """
+# detail="low" 이면 provider 가 512px 로 줄여 고정 토큰만 과금하므로 그 이상은 보내지 않음
+LOW_DETAIL_MAX_PX = 512
+LOW_DETAIL_TOKENS = 85
+# 이미지 캐시에 저장하는 인코딩 결과 앞에 붙는 (width, height)
+CACHED_SIZE = struct.Struct(">HH")
+
+
+def wants_low_detail(keyword: Optional[str]) -> bool:
+    """사진 키워드(쉼표 구분)가 모두 세부 묘사가 필요 없는 키워드면 True"""
+    if not keyword or not DIARY_LOW_DETAIL_KEYWORDS:
+        return False
+    keywords = {k.strip() for k in keyword.split(",") if k.strip()}
+    return bool(keywords) and keywords <= DIARY_LOW_DETAIL_KEYWORDS
+
+
+async def fetch_diary_image(image_path: str) -> Tuple[str, bytes]:
+    """공유 다운로드 세션 + content-addressed 이미지 캐시로 (content hash, bytes) 반환"""
     try:
-        response = requests.get(image_path)
-        response.raise_for_status()
+        return await image_cache.fetch(image_path, download_client.get_bytes)
     except Exception as e:
         logger.error(f"[다운로드 실패] {image_path} - {e}")
         raise
+
+
+async def encode_diary_image(image_path: str, digest: str, content: bytes, low_detail: bool = False) -> EncodedImage:
+    """
+    draft 디코딩 + 축소(확대 없음) 후 DIARY_IMAGE_FORMAT 으로 인코딩 (decode executor 에서 실행).
+    인코딩 결과는 content hash + 설정 기준으로 이미지 캐시에 저장된다.
+    """
+    max_px = LOW_DETAIL_MAX_PX if low_detail else DIARY_IMAGE_MAX_PX
+    # 캐시 값 앞에 인코딩된 크기를 붙여 저장 (캐시 hit 때도 이미지를 다시 열지 않고 토큰 추정)
+    variant = f"diary-sized-{DIARY_IMAGE_FORMAT}-{DIARY_IMAGE_QUALITY}-{max_px}"
+    mime_type = f"image/{DIARY_IMAGE_FORMAT}"
+    cached = await image_cache.get(variant, digest)
+    if cached is not None:
+        width, height = CACHED_SIZE.unpack_from(cached)
+        return EncodedImage(
+            data=cached[CACHED_SIZE.size:], mime_type=mime_type, quality=DIARY_IMAGE_QUALITY,
+            width=width, height=height,
+        )
     try:
-        img = Image.open(io.BytesIO(response.content))
-        # 비율 유지 리사이즈
-        width_percent = target_width / float(img.width)
-        target_height = int(float(img.height) * width_percent)
-        resized_img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-
-        # base64 인코딩
-        buffered = io.BytesIO()
-        resized_img.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
+        encoded = await run_in_executor(
+            encode_reduced, content, (max_px, max_px), DIARY_IMAGE_FORMAT, DIARY_IMAGE_QUALITY,
+        )
     except Exception as e:
         logger.error(f"[이미지 처리 실패] {image_path} - {e}")
         raise
+    await image_cache.put(variant, digest, CACHED_SIZE.pack(encoded.width, encoded.height) + encoded.data)
+    return encoded
 
-async def generate_emotion_prompt(diary: str) -> str:
+
+async def load_diary_image(image_path: str, low_detail: bool = False) -> EncodedImage:
     """
-    Generate a prompt for classifying the emotional tone of a diary entry.
+    Download (or reuse from the image cache) and encode one image.
+    Downloads and encodings are shared through the content-addressed image cache.
     """
-    return  f"""Analyze the content of the following diary entry and classify its overall emotional outcome.
+    digest, content = await fetch_diary_image(image_path)
+    return await encode_diary_image(image_path, digest, content, low_detail)
+
+
+def estimate_payload(encoded: List[EncodedImage], low_detail: List[bool], model: str) -> Tuple[int, int]:
+    """전송할 이미지들의 (총 bytes, 예상 이미지 토큰)"""
+    tokens = 0
+    for image, low in zip(encoded, low_detail):
+        if low:
+            tokens += LOW_DETAIL_TOKENS
+        else:
+            tokens += estimate_image_tokens(image.width, image.height, model=model)
+    return sum(len(image.data) for image in encoded), tokens
+
+
+def sort_by_sequence(image_info: List[PhotoItem]) -> List[PhotoItem]:
+    # sequence 가 없는 사진은 뒤로
+    return sorted(image_info, key=lambda img: (img.sequence is None, img.sequence))
+
+
+EMOTION_TEMPLATE = PromptTemplate(
+    name="emotion",
+    prefix="""Analyze the content of the diary entry given at the end and classify its overall emotional outcome.
 
 Focus on what actually happened and its emotional impact, rather than the tone of expression.
 
@@ -67,9 +166,17 @@ Choose **one** label:
 - **good** – generally positive or pleasant
 - **bad** – something negative, upsetting, or frustrating happened
 
-Diary: {diary}
+Respond with only the label. Do not explain.
+""",
+    suffix="""
+Diary: {diary}""",
+)
 
-Respond with only the label. Do not explain."""
+async def generate_emotion_prompt(diary: str) -> str:
+    """
+    Generate a prompt for classifying the emotional tone of a diary entry.
+    """
+    return EMOTION_TEMPLATE.render(diary=diary)
 
 async def generate_diary_prompt(user_speech: str, image_information: str) -> str:
     """
@@ -165,15 +272,15 @@ Avoid direct reuse of any phrases. Instead, match the **vibe, pacing, emotional
 - Do not include any headings, explanations, or line breaks. Only return the diary and the emoji name, separated by a comma.
 """
 
-async def generate_diary_without_emoji_prompt(user_speech: str, image_information: str) -> str:
-    """
-    Generate a diary entry prompt based on user speech and image information.
-    """
-    return f"""
+# 고정 지시문을 앞에 두고 사용자 말투/사진 정보는 마지막에 붙여 provider prompt cache 가 적용되게 함
+DIARY_TEMPLATE = PromptTemplate(
+    name="diary",
+    prefix="""
 You are a Korean diary writer generating a vivid, natural, and personalized journal entry based on a series of photos and the user’s typical way of speaking.
 
 <Task>
 You are given a series of images (provided in chronological order, sorted by sequence from 0 to N.), along with <Image Information> describing each image’s date, location, and focus elements (e.g., people, food, landscape).
+The <User Speech> and <Image Information> sections are provided at the end of this prompt.
 
 Your task is to write a **single cohesive diary entry in Korean** that:
 
@@ -206,15 +313,6 @@ The diary should read like something the user *naturally wrote themselves*, not
 </Style & Tone Emulation Guide>
 
 
-<User Speech>
-Here is a sample of how the user normally speaks or writes:
-{user_speech}
-</User Speech>
-
-
-<Image Information>
-{image_information}
-
 <Detail Guidelines>
 For each image:
 - Describe it in in **2 to 4 complete sentences**, adapted to the user’s tone and level of detail
@@ -231,7 +329,28 @@ General:
 - Do **not** include any metadata, explanations, line breaks, or headings  
 - Return it as a single line string:  
   **일기 내용**
-"""
+""",
+    suffix="""
+
+<User Speech>
+Here is a sample of how the user normally speaks or writes:
+{user_speech}
+</User Speech>
+
+
+<Image Information>
+{image_information}
+""",
+)
+
+# structured 모드: 감정 분류 지시문까지 고정 prefix 에 포함
+DIARY_STRUCTURED_TEMPLATE = DIARY_TEMPLATE.extend("diary_structured", STRUCTURED_OUTPUT_INSTRUCTIONS)
+
+async def generate_diary_without_emoji_prompt(user_speech: str, image_information: str) -> str:
+    """
+    Generate a diary entry prompt based on user speech and image information.
+    """
+    return DIARY_TEMPLATE.render(user_speech=user_speech, image_information=image_information)
 
 async def generate_diary_without_emoji_gemini_prompt(user_speech: str, image_information: str) -> str:
     """
@@ -275,10 +394,7 @@ async def convert_image_info_to_text(image_info: List[PhotoItem]) -> str:
     """
     Convert image information to a formatted string.
     """
-    sorted_images = sorted(
-        image_info,
-        key=lambda img: (img.sequence is None, img.sequence)
-    )
+    sorted_images = sort_by_sequence(image_info)
 
     return "\n\n".join(
         f"""Image {i}:
@@ -289,10 +405,27 @@ async def convert_image_info_to_text(image_info: List[PhotoItem]) -> str:
         for i, img in enumerate(sorted_images)
     )
 
-async def build_message(prompt: str, images: List[PhotoItem]) -> str:
+async def build_message(prompt: str, images: List[PhotoItem], model: str = DIARY_MODEL) -> str:
     """
     Generate the input message for the AI model.
+    Images are downloaded concurrently, resized/encoded in the decode executor,
+    and appended in `sequence` order to match the <Image Information> text.
     """
+    images = sort_by_sequence(images)
+    fetched = await asyncio.gather(*(fetch_diary_image(i.photoUrl) for i in images))
+    await report_progress("downloaded", images=len(images))
+    low_detail = [wants_low_detail(i.keyword) for i in images]
+    encoded = await asyncio.gather(*(
+        encode_diary_image(i.photoUrl, digest, content, low)
+        for i, (digest, content), low in zip(images, fetched, low_detail)
+    ))
+    total_bytes, tokens = estimate_payload(encoded, low_detail, model)
+    logger.info(
+        f"[일기 이미지 인코딩] {len(encoded)}장 (low detail {sum(low_detail)}장), "
+        f"format={DIARY_IMAGE_FORMAT}, bytes={total_bytes}, tokens≈{tokens} (model={model})"
+    )
+    await report_progress("decoded", images=len(images), bytes=total_bytes, tokens=tokens)
+
     message = [
             {
                 "role": "user",
@@ -301,37 +434,28 @@ async def build_message(prompt: str, images: List[PhotoItem]) -> str:
                 ],
             }
         ]
-
-    for i in images:
-        try:
-            image = await convert_image_to_base64(i.photoUrl)
-            message[0]["content"].append(
-                        {
-                            "type": "input_image", 
-                            "image_url": f"data:image/jpeg;base64,{image}"
-                        },
-            )
-        except Exception as e:
-            logger.error(f"[이미지 처리 실패] {i.photoUrl} - {e}")
-            raise
+    for image, low in zip(encoded, low_detail):
+        message[0]["content"].append(
+                    {
+                        "type": "input_image",
+                        "image_url": image.data_url,
+                        "detail": "low" if low else "auto",
+                    },
+        )
     return message
 
 
 async def build_gemini_message(prompt: str, images: List[str]) -> List[dict]:
     parts = [{"text": prompt}]
-    
-    for i in images:
-        try:
-            img_base64 = await convert_image_to_base64(i.photoUrl)
-            parts.append({
-                "inline_data": {
-                    "mime_type": "image/jpeg",
-                    "data": img_base64
-                }
-            })
-        except Exception as e:
-            logger.error(f"이미지 처리 실패: {i.photoUrl} - {e}")
-            raise
+    images = sort_by_sequence(images)
+    encoded = await asyncio.gather(*(load_diary_image(i.photoUrl) for i in images))
+    for image in encoded:
+        parts.append({
+            "inline_data": {
+                "mime_type": image.mime_type,
+                "data": base64.b64encode(image.data).decode("ascii")
+            }
+        })
 
     return [
         {
@@ -340,6 +464,54 @@ async def build_gemini_message(prompt: str, images: List[str]) -> List[dict]:
         }
     ]
 
+def parse_structured_diary(text: str) -> Optional[Tuple[str, str]]:
+    """structured output 을 (일기, 감정 라벨) 로 파싱. 형식이 맞지 않으면 None"""
+    try:
+        data = json.loads(text)
+        diary, emotion = data["diary"].strip(), data["emotion"].strip().lower()
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"[structured 파싱 실패] {e!r}")
+        return None
+    if not diary or emotion not in EMOTION_EMOJI_MAP:
+        logger.warning(f"[structured 검증 실패] emotion={emotion!r}, diary 길이={len(diary)}")
+        return None
+    return diary, emotion
+
+
+async def generate_structured_diary(message: List[dict], prompt: str) -> Optional[Tuple[str, str]]:
+    """
+    일기와 감정 라벨을 한 번의 호출로 받는다.
+    모델이 형식을 지원하지 않거나 결과가 스키마에 맞지 않으면 None (두 번 호출 방식으로 대체).
+    """
+    # 원래 message 는 대체 경로에서 그대로 쓰므로 프롬프트 파트만 바꾼 사본을 보냄
+    prompt_part, *image_parts = message[0]["content"]
+    structured = [{**message[0], "content": [{**prompt_part, "text": prompt}, *image_parts]}]
+    await report_progress("model_call", step="diary+emotion")
+    try:
+        response = await llm.generate(model=DIARY_MODEL, input=structured, text={"format": DIARY_OUTPUT_FORMAT})
+    except openai.BadRequestError as e:
+        logger.warning(f"[structured 미지원] 두 번 호출 방식으로 대체: {e}")
+        return None
+    return parse_structured_diary(response.text)
+
+
+async def classify_emotion(diary: str) -> str:
+    message = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": await generate_emotion_prompt(diary)},
+            ],
+        }
+    ]
+    await report_progress("model_call", step="emotion")
+    emoji = await llm.generate(
+        model=EMOTION_MODEL,
+        input=message
+    )
+    return emoji.text.strip().lower()
+
+
 async def generate_diary_by_ai(
     req: DiaryRequest
 )-> DiaryResponse:
@@ -353,28 +525,23 @@ async def generate_diary_by_ai(
         prompt = await generate_diary_without_emoji_prompt(user_speech=req.user_speech, image_information=image_info_text)
         message = await build_message(prompt=prompt, images=req.image_info)
 
-        # GPT-4o 멀티모달 호출
-        response = client.responses.create(
-            model="gpt-4.1",
-            input=message
-        )
-        # 결과 파싱
-        output = response.output_text.strip()
-
-        message = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": await generate_emotion_prompt(output)},
-                ],
-            }
-        ]
-
-        emoji = client.responses.create(
-            model="gpt-4.1-nano",
-            input=message
-        )
-        emoji = emoji.output_text.strip().lower()
+        result = None
+        if DIARY_OUTPUT_MODE == "structured":
+            structured_prompt = DIARY_STRUCTURED_TEMPLATE.render(
+                user_speech=req.user_speech, image_information=image_info_text,
+            )
+            result = await generate_structured_diary(message, structured_prompt)
+        if result is None:
+            # 두 번 호출: 일기 생성 후 감정 분류
+            await report_progress("model_call", step="diary")
+            response = await llm.generate(
+                model=DIARY_MODEL,
+                input=message
+            )
+            output = response.text.strip()
+            emoji = await classify_emotion(output)
+        else:
+            output, emoji = result
 
         logger.info(f"[generate 완료] : {output}, {emoji}")
         
@@ -411,21 +578,22 @@ async def generate_diary_by_ai(
     except openai.APIConnectionError as e:
         logger.error(f"[OpenAI 연결 오류] {e}")
         raise RuntimeError("API_CONNECTION_ERROR") from e
-    except openai.RateLimitError as e:
+    except (openai.RateLimitError, RateLimitExceededError) as e:
         logger.error(f"[할당량 초과] {e}")
         raise RuntimeError("RATE_LIMIT") from e
     except openai.APIStatusError as e:
         logger.error(f"[API 상태 오류] {e.status_code}")
         raise RuntimeError(f"API_STATUS_{e.status_code}") from e
+    except CircuitOpenError as e:
+        logger.error(f"[provider 장애로 호출 중단] {e}")
+        raise RuntimeError("PROVIDER_UNAVAILABLE") from e
     except Exception as e:
         logger.exception(f"[예상치 못한 오류] {e}")
         raise RuntimeError("UNKNOWN_ERROR") from e
 
-async def generate_diary_modify_prompt(user_speech: str, diary: str, user_request : str) -> str:
-    """
-    Generate a diary modification prompt based on user speech, existing diary, and user request.
-    """
-    prompt = f"""[ROLE]
+MODIFY_TEMPLATE = PromptTemplate(
+    name="modify",
+    prefix="""[ROLE]
 You are an expert diary editor that revises a user's diary entry based on the user's specific request.
 
 [GOAL]
@@ -466,6 +634,18 @@ After writing the diary entry, analyze the overall emotional tone and classify i
 - **annoyed**
 - **angry**  
 
+[OUTPUT]
+The [USER SPEECH] and [INPUT] sections are provided at the end of this prompt.
+Please output the result in the following format:
+<DIARY>
+(한국어로 수정된 일기 내용)
+</DIARY>
+
+<EMOTION>
+(이모지 이름: happy, smile, angry 등)
+</EMOTION>
+""",
+    suffix="""
 [USER SPEECH]
 Here is a sample of how the user normally speaks or writes:
 {user_speech}
@@ -476,18 +656,155 @@ Original Diary (in Korean):
 
 User Request (in Korean):
 {user_request}
+""",
+)
+
+async def generate_diary_modify_prompt(user_speech: str, diary: str, user_request : str) -> str:
+    """
+    Generate a diary modification prompt based on user speech, existing diary, and user request.
+    """
+    return MODIFY_TEMPLATE.render(user_speech=user_speech, diary=diary, user_request=user_request)
+
+MODIFY_PARTIAL_TEMPLATE = PromptTemplate(
+    name="modify_partial",
+    prefix="""[ROLE]
+You are an expert diary editor that rewrites only selected sentences of a user's diary entry based on the user's request.
+
+[INSTRUCTIONS]
+1. You are given an excerpt of the diary. Sentences to rewrite are wrapped in <EDIT id="k"> ... </EDIT>. Text outside the tags is context only; (...) marks omitted parts.
+2. Rewrite every <EDIT> block so that it reflects the user's request. Do not change anything outside the <EDIT> blocks.
+3. Keep the original tone, writing style, and speech pattern of the diary (the user speech sample is only a supplementary reference).
+4. Each rewritten block must connect naturally to the context before and after it. If the request changes the emotion, make the transition smooth.
+5. Make sure no @ symbols or tags appear inside the rewritten text.
+
+<Emoji Classification>
+Classify the **dominant mood** of the whole diary after your edits with one of:
+love, depression, happy, smile, cool, proud, sneaky, annoyed, angry
 
 [OUTPUT]
-Please output the result in the following format:
-<DIARY>
-(한국어로 수정된 일기 내용)
-</DIARY>
+The [USER SPEECH] and [INPUT] sections are provided at the end of this prompt.
+Return every block with the same id, in order, followed by the emotion:
+<EDIT id="1">
+(한국어로 수정된 문장)
+</EDIT>
 
 <EMOTION>
-(이모지 이름: happy, smile, angry 등)
+(이모지 이름)
 </EMOTION>
-"""
-    return prompt
+""",
+    suffix="""
+[USER SPEECH]
+{user_speech}
+
+[INPUT]
+Diary excerpt (in Korean):
+{excerpt}
+
+User Request (in Korean):
+{user_request}
+""",
+)
+
+EDIT_BLOCK_PATTERN = re.compile(r'<EDIT id="(\d+)">(.*?)</EDIT>', re.DOTALL)
+
+
+def build_partial_excerpt(index: SentenceIndex, groups: List[List[int]], window: int) -> str:
+    """수정할 문장 묶음마다 <EDIT> 태그를 붙이고 앞뒤 window 문장만 문맥으로 포함한 발췌문"""
+    shown = set()
+    for group in groups:
+        shown.update(range(max(1, group[0] - window), min(len(index), group[-1] + window) + 1))
+    starts = {group[0]: (block_id, group) for block_id, group in enumerate(groups, start=1)}
+    parts = []
+    idx, prev = 1, 0
+    while idx <= len(index):
+        if idx not in shown:
+            idx += 1
+            continue
+        if idx != prev + 1:
+            parts.append("(...)")
+        if idx in starts:
+            block_id, group = starts[idx]
+            parts.append(f'<EDIT id="{block_id}">{index.joined(group[0], group[-1])}</EDIT>')
+            idx = group[-1]
+        else:
+            parts.append(index.sentence(idx))
+        prev = idx
+        idx += 1
+    if prev < len(index):
+        parts.append("(...)")
+    return " ".join(parts)
+
+
+async def modify_partial(req: DiaryModifyRequest) -> Optional[DiaryResponse]:
+    """
+    modify_lines 로 지정한 문장만 주변 문맥과 함께 보내 다시 쓰고, 결과를 원문 오프셋에 끼워 넣는다.
+    문장 번호가 잘못되었거나 응답에 일부 블록이 빠지면 None (전체 수정으로 대체).
+    """
+    index = SentenceIndex(req.diary)
+    lines = sorted(set(req.modify_lines))
+    if not lines or lines[0] < 1 or lines[-1] > len(index):
+        logger.warning(f"[부분 수정 불가] 문장 번호 {req.modify_lines} (문장 {len(index)}개)")
+        return None
+    groups = group_consecutive(lines)
+    excerpt = build_partial_excerpt(index, groups, MODIFY_CONTEXT_SENTENCES)
+    prompt = MODIFY_PARTIAL_TEMPLATE.render(
+        user_speech=req.user_speech, excerpt=excerpt, user_request=req.user_request,
+    )
+    logger.info(
+        f"[부분 수정] 문장 {len(index)}개 중 {len(lines)}개 ({len(groups)}구간), "
+        f"발췌 {len(excerpt)}자 / 전체 {len(req.diary)}자"
+    )
+
+    response = await llm.generate(model=MODIFY_MODEL, input=prompt)
+    output = response.text.strip()
+    blocks = {int(block_id): text.strip() for block_id, text in EDIT_BLOCK_PATTERN.findall(output)}
+    if any(not blocks.get(block_id) for block_id in range(1, len(groups) + 1)):
+        logger.warning(f"[부분 수정 실패] 응답에 수정 블록이 없음: {output[:200]}")
+        return None
+
+    emoji = "unknown"
+    if "<EMOTION>" in output:
+        emoji_start = output.find("<EMOTION>") + len("<EMOTION>")
+        emoji_end = output.find("</EMOTION>")
+        emoji = output[emoji_start:emoji_end if emoji_end >= 0 else None].strip().lower()
+    diary_text = index.splice({
+        (group[0], group[-1]): blocks[block_id] for block_id, group in enumerate(groups, start=1)
+    })
+    logger.info(f"[부분 수정 완료] : {diary_text}, {emoji}")
+    return DiaryResponse(diary=diary_text, emoji=emoji)
+
+
+def parse_modify_output(output: str) -> Tuple[str, str]:
+    """수정 응답에서 (일기, 이모지) 추출"""
+    # 명시적 태그를 기준으로 파싱
+    if "<DIARY>" in output and "<EMOTION>" in output:
+        try:
+            # <DIARY> ... </DIARY> 추출
+            diary_start = output.find("<DIARY>") + len("<DIARY>")
+            diary_end = output.find("</DIARY>")
+            diary_text = output[diary_start:diary_end].strip()
+
+            # <EMOTION> ... </EMOTION> 추출
+            emoji_start = output.find("<EMOTION>") + len("<EMOTION>")
+            emoji_end = output.find("</EMOTION>")
+            emoji = output[emoji_start:emoji_end].strip().lower()
+
+        except Exception as e:
+            logger.error(f"[파싱 오류] 형식이 맞지 않습니다: {e}")
+            diary_text = output
+            emoji = "unknown"
+    else:
+        logger.warning("[형식 경고] 예상한 <DIARY> / <EMOTION> 태그가 없음. fallback 방식 사용")
+        tokens = output.strip().rsplit(" ", 1)
+        if len(tokens) == 2:
+            diary_text, emoji = tokens
+            if diary_text.endswith(","):
+                diary_text = diary_text[:-1].strip()
+            emoji = emoji.lower()
+        else:
+            diary_text = output
+            emoji = "unknown"
+    return diary_text, emoji
 
 async def modify_diary(req : DiaryModifyRequest) -> DiaryResponse:
     """
@@ -495,8 +812,12 @@ async def modify_diary(req : DiaryModifyRequest) -> DiaryResponse:
     """
     logger.info("[일기 수정 요청 수신됨]")
     try:
-        # marked_diary = mark_by_sentence_indices(req.diary, req.modify_lines)
-        
+        # 문장 번호가 주어지면 해당 구간만 다시 생성 (실패 시 전체 수정)
+        if req.modify_lines:
+            partial = await modify_partial(req)
+            if partial is not None:
+                return partial
+
         prompt = await generate_diary_modify_prompt(
             user_speech=req.user_speech,
             diary=req.diary,
@@ -505,53 +826,117 @@ async def modify_diary(req : DiaryModifyRequest) -> DiaryResponse:
 
         
         # GPT-4o 멀티모달 호출
-        response = client.responses.create(
-            model="gpt-5.1",
+        response = await llm.generate(
+            model=MODIFY_MODEL,
             input=prompt
         )
         # 결과 파싱
-        output = response.output_text.strip()
+        output = response.text.strip()
 
         
-        # 명시적 태그를 기준으로 파싱
-        if "<DIARY>" in output and "<EMOTION>" in output:
-            try:
-                # <DIARY> ... </DIARY> 추출
-                diary_start = output.find("<DIARY>") + len("<DIARY>")
-                diary_end = output.find("</DIARY>")
-                diary_text = output[diary_start:diary_end].strip()
-
-                # <EMOTION> ... </EMOTION> 추출
-                emoji_start = output.find("<EMOTION>") + len("<EMOTION>")
-                emoji_end = output.find("</EMOTION>")
-                emoji = output[emoji_start:emoji_end].strip().lower()
-
-            except Exception as e:
-                logger.error(f"[파싱 오류] 형식이 맞지 않습니다: {e}")
-                diary_text = output
-                emoji = "unknown"
-        else:
-            logger.warning("[형식 경고] 예상한 <DIARY> / <EMOTION> 태그가 없음. fallback 방식 사용")
-            tokens = output.strip().rsplit(" ", 1)
-            if len(tokens) == 2:
-                diary_text, emoji = tokens
-                if diary_text.endswith(","):
-                    diary_text = diary_text[:-1].strip()
-                emoji = emoji.lower()
-            else:
-                diary_text = output
-                emoji = "unknown"
+        diary_text, emoji = parse_modify_output(output)
         logger.info(f"[modify 완료] : {diary_text}, {emoji}")
         return DiaryResponse(diary = diary_text, emoji =emoji )
     except openai.APIConnectionError as e:
         logger.error(f"[OpenAI 연결 오류] {e}")
         raise RuntimeError("API_CONNECTION_ERROR") from e
-    except openai.RateLimitError as e:
+    except (openai.RateLimitError, RateLimitExceededError) as e:
         logger.error(f"[할당량 초과] {e}")
         raise RuntimeError("RATE_LIMIT") from e
     except openai.APIStatusError as e:
         logger.error(f"[API 상태 오류] {e.status_code}")
         raise RuntimeError(f"API_STATUS_{e.status_code}") from e
+    except CircuitOpenError as e:
+        logger.error(f"[provider 장애로 호출 중단] {e}")
+        raise RuntimeError("PROVIDER_UNAVAILABLE") from e
     except Exception as e:
         logger.exception(f"[예상치 못한 오류] {e}")
         raise RuntimeError("UNKNOWN_ERROR") from e
+
+
+def error_code(e: Exception) -> str:
+    """스트리밍 중 오류를 비스트리밍 API 와 같은 오류 코드로 변환"""
+    if isinstance(e, openai.APIConnectionError):
+        return "API_CONNECTION_ERROR"
+    if isinstance(e, (openai.RateLimitError, RateLimitExceededError)):
+        return "RATE_LIMIT"
+    if isinstance(e, openai.APIStatusError):
+        return f"API_STATUS_{e.status_code}"
+    if isinstance(e, CircuitOpenError):
+        return "PROVIDER_UNAVAILABLE"
+    return "UNKNOWN_ERROR"
+
+
+async def stream_diary(req: DiaryRequest) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    일기 텍스트를 생성되는 대로 ("delta", {"text"}) 로 보내고,
+    감정 분류가 끝나면 마지막에 ("emoji", {"emoji", "diary"}) 를 보낸다.
+    응답이 이미 시작된 뒤라 오류는 ("error", {"code"}) 이벤트로 전달한다.
+    """
+    logger.info("[일기 생성 스트리밍 요청 수신됨]")
+    try:
+        image_info_text = await convert_image_info_to_text(req.image_info)
+        prompt = await generate_diary_without_emoji_prompt(user_speech=req.user_speech, image_information=image_info_text)
+        message = await build_message(prompt=prompt, images=req.image_info)
+
+        parts = []
+        async for delta in llm.stream(model=DIARY_MODEL, input=message):
+            parts.append(delta)
+            yield "delta", {"text": delta}
+        output = "".join(parts).strip()
+
+        # 감정 분류는 일기 전체가 필요하므로 스트림이 끝난 뒤 호출
+        emoji = pick_emoji_by_emotion(await classify_emotion(output))
+        logger.info(f"[generate stream 완료] : {output}, {emoji}")
+        yield "emoji", {"emoji": emoji, "diary": output}
+    except Exception as e:
+        logger.exception(f"[스트리밍 오류] {e}")
+        yield "error", {"code": error_code(e)}
+
+
+async def stream_modify(req: DiaryModifyRequest) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    수정된 일기의 <DIARY> 섹션만 생성되는 대로 ("delta", {"text"}) 로 보내고,
+    응답이 끝나면 <EMOTION> 을 파싱해 ("emoji", {"emoji", "diary"}) 를 보낸다.
+    modify_lines 가 있으면 부분 수정 결과 전체를 delta 한 번으로 보낸다.
+    """
+    logger.info("[일기 수정 스트리밍 요청 수신됨]")
+    try:
+        # 문장 번호가 주어지면 /modify 와 같이 해당 구간만 다시 생성해 한 번에 전송 (실패 시 전체 수정 스트리밍)
+        if req.modify_lines:
+            partial = await modify_partial(req)
+            if partial is not None:
+                yield "delta", {"text": partial.diary}
+                yield "emoji", {"emoji": partial.emoji, "diary": partial.diary}
+                return
+
+        prompt = await generate_diary_modify_prompt(
+            user_speech=req.user_speech,
+            diary=req.diary,
+            user_request=req.user_request
+        )
+        section = TaggedSectionStream("DIARY")
+        streamed = []
+        async for delta in llm.stream(model=MODIFY_MODEL, input=prompt):
+            text = section.feed(delta)
+            if text:
+                streamed.append(text)
+                yield "delta", {"text": text}
+        # </DIARY> 없이 끝난 경우 보류 중이던 끝부분까지 전송
+        text = section.flush()
+        if text:
+            streamed.append(text)
+            yield "delta", {"text": text}
+
+        diary_text, emoji = parse_modify_output(section.raw.strip())
+        if section.started:
+            # 클라이언트가 받은 텍스트와 최종 일기를 일치시킴 (닫는 태그가 없으면 파싱 결과가 다를 수 있음)
+            diary_text = "".join(streamed)
+        else:
+            # 태그 없이 응답한 경우 파싱 결과를 한 번에 전송
+            yield "delta", {"text": diary_text}
+        logger.info(f"[modify stream 완료] : {diary_text}, {emoji}")
+        yield "emoji", {"emoji": emoji, "diary": diary_text}
+    except Exception as e:
+        logger.exception(f"[스트리밍 오류] {e}")
+        yield "error", {"code": error_code(e)}
@@ -1,33 +1,72 @@
+import asyncio
+import hashlib
+import itertools
+import math
+
 from app.utils.image_utils import (
-    load_images_from_urls,
-    load_and_decode_images,
-    create_collage_with_padding,
-    create_reference_collage,
+    download_images,
     build_message,
-    build_message_gemini,
-    create_collage_with_padding_refIMG
 )
-from app.schemas.image_schema import ImageScoringRequest, ImageScoringResponse
-from app.core.config import client
+from app.utils.collage_utils import REFERENCE_HEADER_HEIGHT, render_indexed_collage, render_reference_collage
+from app.utils.layout_utils import plan_layout
+from app.utils.prompt_utils import PromptTemplate
+from app.utils.image_analysis import analyze_images, cluster_near_duplicates, select_diverse
+from app.core.executor import run_in_executor
+from app.core.jobs import report_progress
+from app.core.ratelimit import BATCH, request_priority
+from app.core.resilience import deadline
+from app.core.cache import TTLCache
+from app.utils.image_cache import ImageCache, image_cache
+from app.schemas.image_schema import (
+    ImageScoringRequest,
+    ImageScoringResponse,
+    ImageScoringBatchRequest,
+    AlbumScoringResult,
+)
+from app.core import llm
+from app.core.config import (
+    GEMINI_MODEL,
+    COLLAGE_FORMAT,
+    COLLAGE_QUALITY,
+    COLLAGE_MIN_QUALITY,
+    COLLAGE_PAYLOAD_BUDGET_BYTES,
+    COLLAGE_TOKEN_BUDGET,
+    COLLAGE_MIN_CELL_PX,
+    COLLAGE_MAX_CELL_PX,
+    DEDUP_ENABLED,
+    DEDUP_HAMMING_THRESHOLD,
+    SCORER_MAX_CANDIDATES,
+    SCORER_LLM_DEADLINE_SECONDS,
+    SCORER_MODEL,
+    SCORER_TOURNAMENT_ENABLED,
+    SCORER_TOURNAMENT_MIN_CANDIDATES,
+    SCORER_FANOUT_COLLAGES,
+    SCORER_FINAL_CANDIDATES,
+    SCORE_CACHE_TTL_SECONDS,
+    SCORE_CACHE_MAX_ENTRIES,
+    SCORE_BATCH_CONCURRENCY,
+)
 from app.core.logger import logger
-from app.core.config import model
 
-import random 
 
-MLLM_SCORING_PROMPT = """You are given a sequence of images.
+# 고정 지시문은 앞에, 참조 이미지 수/선택 개수는 마지막 <Request> 에만 넣어서
+# 참조 이미지 유무와 관계없이 모든 스코어링 호출이 같은 prefix 를 공유하게 함
+SCORING_TEMPLATE = PromptTemplate(
+    name="scoring",
+    prefix="""You are given a sequence of images.
 
-- The **last collage** you see is composed of {num_reference} **reference images**. Do **NOT** select any image from this reference collage.
-- The remaining images(1st image ~  penultimate image) are part of one or more **4×4 collages**, each image labeled with a red number in the upper-left corner.
-- You must select only from the collage images (i.e., excluding the reference images).
+- The images are part of one or more **grid collages**, each image labeled with a red number in the upper-left corner.
+- If the <Request> section at the end says reference images are included, the **last collage** you see is composed of **reference images** and has a red [REFERENCE IMAGES] header. Do **NOT** select any image from this reference collage.
+- You must select only from the numbered collage images (i.e., excluding the reference images).
 
-Your task is to evaluate all collage images (excluding the reference images), and select exactly **{top_k} images** that are both:
+Your task is to evaluate all collage images (excluding the reference images), and select exactly **N images**, where N is given in the <Request> section at the end, that are both:
 1. Visually diverse and not too similar to any other image.
 2. Aesthetically pleasing.
 
 <Rules – Priority Order>
-1. You must select **exactly {top_k} images**, no more, no less. This is the most important rule.
+1. You must select **exactly N images**, no more, no less. This is the most important rule.
 2. Select images that are visually diverse in subject, style, or composition, and avoid those that are overly similar to any reference image.
-3. Avoid selecting images that are visually similar (≥75%) to any **reference image**.
+3. Avoid selecting images that are visually similar (≥75%) to any **reference image** or to any other selected image.
 4. Select images that are both **aesthetically pleasing** and **visually distinct**.
 5. Aesthetically pleasing images should:
    - Be sharp and in clear focus.
@@ -36,7 +75,7 @@ Your task is to evaluate all collage images (excluding the reference images), an
    - Have natural lighting with good contrast and proper exposure.
    - Present a harmonious color scheme and emotionally appealing atmosphere.
 6. Consider **diversity of subject matter** (e.g., landscapes, portraits, food, architecture, etc.).
-7. Choose the {top_k} best images based on overall quality and uniqueness.
+7. Choose the N best images based on overall quality and uniqueness.
 
 ⚠️ You **must evaluate every single image in the collage(s)** (excluding the reference images).  
 Do **not** skip or ignore any images.
@@ -47,7 +86,7 @@ Use one short line per image (e.g., `#12: unique color but similar to #3`). You
 
 After evaluation, return your final answer **only after the token**: `[final output]`  
 
-**After `[final output]`, return exactly {top_k} image numbers**, in descending order of visual quality and uniqueness, separated by commas.  
+**After `[final output]`, return exactly N image numbers**, in descending order of visual quality and uniqueness, separated by commas.  
 No explanation, score, or extra text should appear after that token.
 
 Format:
@@ -56,7 +95,7 @@ Format:
 #2: ...  
 ...  
 [final output]  
-3, 7, 12, ... (exactly {top_k} image numbers)
+3, 7, 12, ... (exactly N image numbers)
 
 
 
@@ -65,164 +104,359 @@ Format:
 - Any explanation after `[final output]`  
 
 ❗ Even if many images are visually similar or duplicated,  
-   YOU MUST STILL OUTPUT *exactly {top_k} image numbers*.  
+   YOU MUST STILL OUTPUT *exactly N image numbers*.  
    Duplicated photos still count as separate candidates.  
    Rank them lower if needed, but do NOT skip them.
-"""
-
-NO_REF_PROMPT = """You are given a sequence of images.
-
-- The remaining images are part of one or more **4×4 collages**, each image labeled with a red number in the upper-left corner.
-- You must select only from the collage images.
+""",
+    suffix="""
+<Request>
+- Reference images: {reference_line}
+- N = {top_k}: select exactly **{top_k} images**.
+""",
+)
 
-Your task is to evaluate all collage images, and select exactly **9 images** that are both:
-1. Visually diverse and not too similar to any other image.
-2. Aesthetically pleasing.
+SHORTLIST_TEMPLATE = PromptTemplate(
+    name="shortlist",
+    prefix="""You are given one or more **grid collages** of candidate photos from a larger album.
+Each image is labeled with a red number in the upper-left corner.
 
-<Rules – Priority Order>
-1. You must select **exactly 9 images**, no more, no less. This is the most important rule.
-2. Select images that are visually diverse in subject, style, or composition.
-3. Avoid selecting images that are visually similar (≥75%) to any other images.
-4. Select images that are both **aesthetically pleasing** and **visually distinct**.
-5. Aesthetically pleasing images should:
-   - Be sharp and in clear focus.
-   - Be high-resolution and high-quality.
-   - Have a well-balanced composition.
-   - Have natural lighting with good contrast and proper exposure.
-   - Present a harmonious color scheme and emotionally appealing atmosphere.
-6. Consider **diversity of subject matter** (e.g., landscapes, portraits, food, architecture, etc.).
-7. Choose the 9 best images based on overall quality and uniqueness.
+Your task is to shortlist exactly **K images**, where K and the number range are given in the <Request> section at the end, that are the strongest candidates for the final album selection:
+1. Aesthetically pleasing: sharp, well exposed, well composed, with a harmonious color scheme.
+2. Visually diverse: do not shortlist two images that are near-duplicates of each other.
 
-⚠️ You **must evaluate every single image in the collage(s)**.  
-Do **not** skip or ignore any images.
+⚠️ You **must evaluate every single image in the collage(s)**.
 
 <Output Format>
-You may include your reasoning and thoughts during evaluation using the `[thinking]` section.  
-Use one short line per image (e.g., `#12: unique color but similar to #3`). You may note similarities, issues, or standout qualities.  
-
-After evaluation, return your final answer **only after the token**: `[final output]`  
-
-**After `[final output]`, return exactly 9 image numbers**, in descending order of visual quality and uniqueness, separated by commas.  
+Return your final answer **only after the token**: `[final output]`
+**After `[final output]`, return exactly K image numbers**, best first, separated by commas.
 No explanation, score, or extra text should appear after that token.
 
 Format:
-[thinking]  
-#1: brief comment (e.g., good, top, similar to n, creative, bad, etc.)  
-#2: ...  
-...  
-[final output]  
-3, 7, 12, ... (exactly 9 image numbers)
-
-
-
-⚠️ Do NOT include:
-- Any greeting
-- Any explanation after `[final output]`  
+[final output]
+(first number), ... (exactly K image numbers)
+""",
+    suffix="""
+<Request>
+- The numbers in this request range from {first} to {last}.
+- K = {shortlist_k}: shortlist exactly **{shortlist_k} images**.
+""",
+)
 
-❗ Even if many images are visually similar or duplicated,  
-   YOU MUST STILL OUTPUT *exactly 9 image numbers*.  
-   Duplicated photos still count as separate candidates.  
-   Rank them lower if needed, but do NOT skip them.
-"""
 
+# 프롬프트/모델/선택 설정이 바뀌면 이전 캐시 결과를 쓰지 않도록 키에 포함
+SCORER_CACHE_VERSION = hashlib.sha256("\n".join([
+    SCORER_MODEL,
+    SCORING_TEMPLATE.version,
+    SHORTLIST_TEMPLATE.version,
+    f"{DEDUP_ENABLED}:{DEDUP_HAMMING_THRESHOLD}:{SCORER_MAX_CANDIDATES}",
+    f"{COLLAGE_TOKEN_BUDGET}:{COLLAGE_MIN_CELL_PX}:{COLLAGE_MAX_CELL_PX}",
+]).encode()).hexdigest()[:16]
+
+score_cache = TTLCache(max_entries=SCORE_CACHE_MAX_ENTRIES, ttl=SCORE_CACHE_TTL_SECONDS)
+
+def score_cache_key(mode, contents, reference_contents, photos, reference_photos) -> str:
+    """(id, content hash) 순서 목록 + 참조 이미지 + 모드 + 프롬프트/모델 버전으로 만든 키"""
+    def entries(items, photo_list):
+        return [
+            f"{id_}:{image_cache.url_digest(str(photo.photoUrl)) or ImageCache.digest(content)}"
+            for (content, id_), photo in zip(items, photo_list)
+        ]
+    key = "|".join([
+        SCORER_CACHE_VERSION,
+        mode,
+        ",".join(entries(contents, photos)),
+        ",".join(entries(reference_contents, reference_photos)),
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def fill_by_quality(selected_ids, candidate_ids, quality_by_id, total=9):
+    """
+    선택이 total 개보다 적으면 아직 선택되지 않은 후보 중 품질 점수 순으로 채운다.
+    콜라주에 들어간 후보(유사 묶음 대표)를 먼저 쓰고, 그래도 부족하면 나머지 이미지에서 채움.
+    """
+    selected_ids = list(dict.fromkeys(selected_ids))  # 순서 유지 중복 제거
+    chosen = set(selected_ids)
+    by_quality = lambda ids: sorted((i for i in ids if i not in chosen), key=lambda i: -quality_by_id.get(i, 0.0))
+    remaining = by_quality(candidate_ids)
+    remaining += by_quality(set(quality_by_id) - set(candidate_ids))
+    return selected_ids + remaining[:max(0, total - len(selected_ids))]
+
+def collage_encoding(num_collages: int) -> dict:
+    """요청 전체 payload 예산을 콜라주 수로 나눠 콜라주별 인코딩 설정을 만든다."""
+    return {
+        "fmt": COLLAGE_FORMAT,
+        "quality": COLLAGE_QUALITY,
+        "min_quality": COLLAGE_MIN_QUALITY,
+        "max_bytes": COLLAGE_PAYLOAD_BUDGET_BYTES // max(num_collages, 1),
+    }
 
 def generate_scoring_prompt(num_reference: int) -> str:
     if num_reference == 0:
-        return NO_REF_PROMPT
+        reference_line = "none. All collages are candidates."
     else:
-        return MLLM_SCORING_PROMPT.format(num_reference=num_reference, top_k=9-num_reference)
+        reference_line = f"{num_reference} images in the last collage. Do NOT select from it."
+    return SCORING_TEMPLATE.render(reference_line=reference_line, top_k=9 - num_reference)
 
 # GPT 이미지 선택 함수
 async def mllm_select_images_gpt(collages, num_ref, model="gpt-4o-mini", collage_ref=None):
     message = build_message(generate_scoring_prompt(num_ref), collages, collage_ref)
-    resp = client.responses.create(model=model, input=message)
-    return resp.output[0].content[0].text
+    resp = await llm.generate(model=model, input=message)
+    return resp.text
 
 async def mllm_select_images_gemini(collages, num_ref, collage_ref = None):
-    message = build_message_gemini(generate_scoring_prompt(num_ref), collages, collage_ref)
-    resp = model.generate_content(message)
+    message = build_message(generate_scoring_prompt(num_ref), collages, collage_ref)
+    resp = await llm.generate(model=GEMINI_MODEL, input=message, provider="gemini")
     return resp.text
 
+def parse_selected_numbers(selected: str):
+    # GPT 응답에서 [final output] 이후 텍스트만 추출
+    if "[final output]" in selected:
+        selected_text = selected.split("[final output]", 1)[1]
+    else:
+        logger.warning("GPT 응답에 [final output]이 없음")
+        selected_text = selected  # fallback
+
+    # 쉼표 기준으로 나눠서 정수 추출
+    return [int(x.strip()) for x in selected_text.strip().split(",") if x.strip().isdigit()]
+
+async def render_collages(indexed_contents, reference_contents=()):
+    """
+    (content, 번호) 목록을 이미지 토큰 예산에 맞춘 격자 콜라주들로, 참조 이미지는 마지막 콜라주 한 장으로 만든다.
+    마지막 콜라주는 채워진 행까지만 그린다.
+    """
+    layout = plan_layout(len(indexed_contents))
+    ref_layout = plan_layout(len(reference_contents), top_margin=REFERENCE_HEADER_HEIGHT) if reference_contents else None
+    encoding = collage_encoding(layout.count + (1 if ref_layout else 0))
+    cell = (layout.cell, layout.cell)
+    collage_tasks = []
+    for i in range(0, len(indexed_contents), layout.capacity):
+        chunk = indexed_contents[i:i + layout.capacity]
+        rows = math.ceil(len(chunk) / layout.cols)
+        collage_tasks.append(run_in_executor(render_indexed_collage, chunk, rows, layout.cols, cell, encoding))
+    if ref_layout:
+        # 참조 콜라주는 마지막에 한 번만 전송 (참조 이미지가 한 장에 다 들어가도록 격자 확장)
+        ref_cols = ref_layout.cols
+        ref_rows = math.ceil(len(reference_contents) / ref_cols)
+        collage_tasks.append(run_in_executor(
+            render_reference_collage, [c for c, _ in reference_contents],
+            ref_rows, ref_cols, (ref_layout.cell, ref_layout.cell), encoding,
+        ))
+    collages = list(await asyncio.gather(*collage_tasks))
+    tokens = layout.tokens + (ref_layout.tokens if ref_layout else 0)
+    await report_progress("collaged", collages=len(collages), tokens=tokens)
+    logger.info(
+        f"[이미지 토큰 예측] 후보={len(indexed_contents)}, 배치={layout}"
+        f"{f', 참조={ref_layout}' if ref_layout else ''}, tokens≈{tokens} (model={SCORER_MODEL})"
+    )
+    logger.info(
+        f"[콜라주 인코딩] format={COLLAGE_FORMAT}, 개수={len(collages)}, "
+        f"bytes={sum(len(c.data) for c in collages)}, "
+        f"quality={[c.quality for c in collages]}, "
+        f"encode={sum(c.encode_seconds for c in collages) * 1000:.1f}ms"
+    )
+    return collages
+
+async def shortlist_candidates(indexed_contents):
+    """
+    토너먼트 1차: 콜라주 SCORER_FANOUT_COLLAGES 장씩 묶어 동시에 호출하고
+    각 묶음에서 후보를 추려 번호 목록으로 반환한다.
+    """
+    group_size = plan_layout(len(indexed_contents)).capacity * SCORER_FANOUT_COLLAGES
+    groups = [indexed_contents[i:i + group_size] for i in range(0, len(indexed_contents), group_size)]
+    # 결승 후보가 SCORER_FINAL_CANDIDATES 를 넘지 않도록 묶음별 할당량을 나누고 나머지는 앞 묶음부터 1장씩
+    base, extra = divmod(SCORER_FINAL_CANDIDATES, len(groups))
+    quotas = [max(1, base + (1 if i < extra else 0)) for i in range(len(groups))]
+
+    async def run_group(group, quota):
+        collages = await render_collages(group)
+        k = min(quota, len(group))
+        prompt = SHORTLIST_TEMPLATE.render(first=group[0][1], last=group[-1][1], shortlist_k=k)
+        await report_progress("model_call", round="shortlist")
+        resp = await llm.generate(model=SCORER_MODEL, input=build_message(prompt, collages))
+        valid = {idx for _, idx in group}
+        return [i for i in parse_selected_numbers(resp.text) if i in valid][:k]
+
+    results = await asyncio.gather(*(run_group(group, quota) for group, quota in zip(groups, quotas)), return_exceptions=True)
+    picks = []
+    for group, result in zip(groups, results):
+        if isinstance(result, Exception):
+            logger.warning(f"[토너먼트] {group[0][1]}~{group[-1][1]}번 묶음 실패: {result!r}")
+            continue
+        picks.append(result)
+    if not any(picks):
+        raise RuntimeError("SHORTLIST_FAILED")
+    # 묶음별 선택은 모델이 고른 순위 그대로 두고, 순위별로 묶음을 돌아가며 채워서 상한을 넘는 하위 순위부터 잘라냄
+    shortlist = []
+    for rank_picks in itertools.zip_longest(*picks):
+        for idx in rank_picks:
+            if idx is not None and idx not in shortlist and len(shortlist) < SCORER_FINAL_CANDIDATES:
+                shortlist.append(idx)
+    # 결승 콜라주는 원래 순서로 배치
+    shortlist.sort()
+    logger.info(f"[토너먼트] 1차 호출 {len(groups)}건, shortlist {len(shortlist)}장: {shortlist}")
+    return shortlist
+
+async def select_with_llm(candidates, reference_contents):
+    """후보를 콜라주로 만들어 MLLM 에 보내고, 선택된 번호를 원래 id 로 바꿔 반환"""
+    # 대형 앨범은 콜라주별 병렬 호출로 후보를 먼저 추린 뒤 결승 호출 한 번으로 최종 선택
+    if SCORER_TOURNAMENT_ENABLED and len(candidates) >= SCORER_TOURNAMENT_MIN_CANDIDATES:
+        shortlist = await shortlist_candidates(
+            [(content, idx) for idx, (content, _) in enumerate(candidates, start=1)]
+        )
+        candidates = [candidates[idx - 1] for idx in shortlist]
+
+    idx_to_id_map = {}
+    # # ID ↔ 번호 매핑
+    indexed_contents = []
+    for idx, (content, id_) in enumerate(candidates, start=1):
+        indexed_contents.append((content, idx))
+        idx_to_id_map[idx] = id_
+
+    # 콜라주 생성 (워커에서 셀 축소 + 합성 + 인코딩, 완성된 콜라주만 반환)
+    collages = await render_collages(indexed_contents, reference_contents)
+
+    logger.info(f"api 요청 전송")
+    await report_progress("model_call", round="final")
+    selected = await mllm_select_images_gpt(collages=collages,num_ref=len(reference_contents),model=SCORER_MODEL)
+    logger.info(f"api 응답 수신: {selected}")
+
+    selected_idxs = parse_selected_numbers(selected)
+    selected_ids = [idx_to_id_map[i] for i in selected_idxs if i in idx_to_id_map]
+    logger.info(f"GPT 선택 번호: {selected_idxs}")
+    logger.info(f"gpt_number_to_id.keys(): {list(idx_to_id_map)}")
+    return selected_ids
+
+def select_locally(features, representatives, contents, num_refs):
+    """
+    LLM 없이 로컬 특징만으로 선택 (MMR: 품질 + 다양성).
+    참조 이미지는 features 의 뒤쪽에 있으며 이미 선택된 것으로 취급해 비슷한 사진을 피한다.
+    """
+    preselected = list(range(len(contents), len(contents) + num_refs))
+    picked = select_diverse(features, representatives, k=max(0, 9 - num_refs), preselected=preselected)
+    return [contents[i][1] for i in picked]
+
+async def score_album(request: ImageScoringRequest) -> ImageScoringResponse:
+    """
+    앨범 하나의 추천 이미지 id 를 반환. 실패하면 예외를 그대로 올린다
+    (배치/job 에서 앨범별 오류를 기록할 수 있도록).
+    """
+    if request.reference_images:
+        reference_ids = {photo.id for photo in request.reference_images}
+        request.images = [photo for photo in request.images if photo.id not in reference_ids]
+    # 이미지 다운로드 (디코딩은 분석 워커에서 한 번만 수행)
+    contents = await download_images(request.images)
+    reference_contents = await download_images(request.reference_images) if request.reference_images else []
+    await report_progress("downloaded", images=len(contents), references=len(reference_contents))
+
+    # 같은 앨범(내용 기준) 재요청은 provider 호출 없이 캐시된 결과 반환
+    cache_key = score_cache_key(request.mode, contents, reference_contents, request.images, request.reference_images)
+    cached = score_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"[스코어 캐시 hit] {cached.recommendedPhotoIds}")
+        return cached.model_copy(deep=True)
+    used_fallback = False
+
+    # 로컬 분석 (dHash + 품질 점수 + 색 히스토그램, 디코딩 워커에서 계산)
+    # 참조 이미지도 함께 분석해서 로컬 선택 시 비슷한 사진을 피하는 데 사용
+    # 분석에서 디코딩한 썸네일을 콜라주 셀로 재사용 (원본은 이미지당 한 번만 디코딩)
+    all_features, thumbs = await analyze_images([c for c, _ in contents] + [c for c, _ in reference_contents])
+    features = all_features.take(range(len(contents)))
+    cells = [(thumb, id_) for thumb, (_, id_) in zip(thumbs, contents)]
+    reference_cells = [(thumb, id_) for thumb, (_, id_) in zip(thumbs[len(contents):], reference_contents)]
+    await report_progress("decoded", images=len(contents) + len(reference_contents))
+    quality_by_id = {id_: float(q) for (_, id_), q in zip(contents, features.quality)}
+
+    # 유사 이미지 묶기: 묶음마다 품질이 가장 좋은 1장만 콜라주에 넣고 그 원래 id 로 매핑
+    representatives = list(range(len(contents)))
+    if DEDUP_ENABLED and len(contents) > 1:
+        clusters = cluster_near_duplicates(features.hashes, DEDUP_HAMMING_THRESHOLD)
+        representatives = sorted(max(cluster, key=lambda i: features.quality[i]) for cluster in clusters)
+        logger.info(f"[유사 이미지 묶기] {len(contents)}장 -> {len(representatives)}장")
+
+    # 후보가 너무 많으면 품질 상위 N장만 모델에 보냄 (원래 순서 유지)
+    if len(representatives) > SCORER_MAX_CANDIDATES:
+        top = sorted(representatives, key=lambda i: -features.quality[i])[:SCORER_MAX_CANDIDATES]
+        representatives = sorted(top)
+        logger.info(f"[후보 제한] 품질 상위 {SCORER_MAX_CANDIDATES}장만 전송")
+    candidates = [cells[i] for i in representatives]
+
+    if request.mode == "local":
+        selected_ids = select_locally(all_features, representatives, contents, len(reference_contents))
+        logger.info(f"선택된 이미지 ID(local): {selected_ids}")
+    else:
+        try:
+            # 재시도 대기도 같은 마감 시각 안에서만 (넘길 것 같으면 바로 로컬 선택으로 대체)
+            with deadline(SCORER_LLM_DEADLINE_SECONDS):
+                selected_ids = await asyncio.wait_for(
+                    select_with_llm(candidates, reference_cells),
+                    timeout=SCORER_LLM_DEADLINE_SECONDS,
+                )
+            logger.info(f"선택된 이미지 ID(by ai): {selected_ids}")
+        except Exception as e:
+            # provider 오류/시간 초과 시 빈 결과 대신 로컬 선택으로 대체
+            logger.warning(f"[로컬 선택으로 대체] LLM 선택 실패: {e!r}")
+            used_fallback = True
+            selected_ids = select_locally(all_features, representatives, contents, len(reference_contents))
+            logger.info(f"선택된 이미지 ID(local fallback): {selected_ids}")
+
+    selected_ids.extend([photo.id for photo in request.reference_images])  # reference 이미지 ID 추가
+    logger.info(f"최종 이미지 ID(ref 포함함): {selected_ids}")
+
+    if len(selected_ids) < 9:
+        logger.warning(f"선택된 이미지 수가 9개 미만: {len(selected_ids)}. 품질 점수 상위 이미지 추가")
+        selected_ids = fill_by_quality(selected_ids, [id_ for _, id_ in candidates], quality_by_id)
+        logger.info(f"선택된 이미지 ID(품질 순 추가): {selected_ids}")
+
+    # 9개로 제한
+    selected_ids = selected_ids[:9]
+    logger.info(f"최종 추천 이미지 ID: {selected_ids}")
+
+    response = ImageScoringResponse(
+        recommendedPhotoIds=selected_ids
+    )
+    # 장애로 대체된 결과는 캐시하지 않아야 재시도 때 모델 결과를 받을 수 있음
+    if not used_fallback and selected_ids:
+        score_cache.set(cache_key, response.model_copy(deep=True))
+    return response
+
 async def score_images(request: ImageScoringRequest):
     """
     이미지 URL 리스트를 받아서 추천 이미지 id를 반환하는 API 엔드포인트
     """
     logger.info("이미지 스코어링 요청 수신됨")
     try:
-        if request.reference_images:
-            reference_ids = {photo.id for photo in request.reference_images}
-            request.images = [photo for photo in request.images if photo.id not in reference_ids]
-        idx_to_id_map = {}
-        # 이미지 불러오기
-        images_list = await load_and_decode_images(request.images)
-        reference_list = await load_and_decode_images(request.reference_images) if request.reference_images else []
-
-        # # ID ↔ 번호 매핑
-        indexed_images = []
-        for idx, (img, id_) in enumerate(images_list, start=1):
-            indexed_images.append((img, id_, idx))
-            idx_to_id_map[idx] = id_
-            # 콜라주 생성
-        collages = []
-        for i in range(0, len(indexed_images), 16):
-            group = [(img, idx) for img, id_, idx in indexed_images[i:i+16]]
-            collage = create_collage_with_padding(group, rows=4, cols=4)
-            collages.append(collage)
-        collage_ref = None
-        if reference_list:
-            ref_images = [(img, idx+1) for idx, (img, _) in enumerate(reference_list)]
-            collage_ref = create_collage_with_padding_refIMG(ref_images, rows=3, cols=3)
-            collages.append(collage_ref)
-
-        logger.info(f"api 요청 전송")
-        selected = await mllm_select_images_gpt(collages=collages,num_ref=len(reference_list),model="gpt-4.1",collage_ref=collage_ref)
-        logger.info(f"api 응답 수신: {selected}")
-        
-        # GPT 응답에서 [final output] 이후 텍스트만 추출
-        if "[final output]" in selected:
-            selected_text = selected.split("[final output]", 1)[1]
-        else:
-            logger.warning("GPT 응답에 [final output]이 없음")
-            selected_text = selected  # fallback
-
-        # 쉼표 기준으로 나눠서 정수 추출
-        selected_idxs = [int(x.strip()) for x in selected_text.strip().split(",") if x.strip().isdigit()]
-        selected_ids = [idx_to_id_map[i] for i in selected_idxs if i in idx_to_id_map]
-        logger.info(f"선택된 이미지 ID(by ai): {selected_ids}")
-        selected_ids.extend([photo.id for photo in request.reference_images])  # reference 이미지 ID 추가
-        logger.info(f"최종 이미지 ID(ref 포함함): {selected_ids}")
-        logger.info(f"GPT 선택 번호: {selected_idxs}")
-        logger.info(f"gpt_number_to_id.keys(): {list(idx_to_id_map)}")
-
-
-        if len(selected_ids) < 9:
-            logger.warning(f"선택된 이미지 수가 9개 미만: {len(selected_ids)}. 랜덤 추천 이미지 추가")
-            all_candidate_ids = [photo.id for photo in request.images]
-
-            # 이미 선택된 ID (GPT 선택 + ref 이미지)
-            selected_ids = list(set(selected_ids))  # 중복 제거
-
-            # 아직 선택되지 않은 ID 중에서 랜덤하게 미리 섞어둠 (최대 9장까지 대비)
-            remaining_ids = list(set(all_candidate_ids) - set(selected_ids))
-            random.shuffle(remaining_ids)
-
-            # 부족한 수 계산
-            missing_count = 9 - len(selected_ids)
-
-            # 부족분만큼 추가
-            if missing_count > 0:
-                selected_ids.extend(remaining_ids[:missing_count])
-            logger.info(f"선택된 이미지 ID(random 추가): {selected_ids}")
-
-        # 9개로 제한
-        selected_ids = selected_ids[:9]
-        logger.info(f"최종 추천 이미지 ID: {selected_ids}")
-            
-        return ImageScoringResponse(
-            recommendedPhotoIds=selected_ids
-        )
+        return await score_album(request)
     except Exception as e:
         logger.error(f"이미지 스코어링 중 오류 발생: {e}")
         return ImageScoringResponse(
             recommendedPhotoIds=[]
         )
+
+async def score_batch(request: ImageScoringBatchRequest):
+    """
+    여러 앨범을 SCORE_BATCH_CONCURRENCY 개씩 동시에 score_album 으로 처리하고,
+    끝나는 순서대로 앨범별 결과를 yield 한다.
+    다운로드 세션/디코딩 executor/LLM 커넥션 풀은 단건 /score 와 그대로 공유한다.
+    """
+    logger.info(f"[배치 스코어링] 앨범 {len(request.albums)}개 수신, 동시 처리 {SCORE_BATCH_CONCURRENCY}")
+    semaphore = asyncio.Semaphore(SCORE_BATCH_CONCURRENCY)
+
+    async def run_album(album):
+        # 배치 앨범의 LLM 호출은 대기열에서 단건 요청 뒤로 보냄 (task 별 context 라 호출자에는 영향 없음)
+        request_priority.set(BATCH)
+        async with semaphore:
+            try:
+                response = await score_album(album)
+                return AlbumScoringResult(albumId=album.albumId, recommendedPhotoIds=response.recommendedPhotoIds)
+            except Exception as e:
+                logger.error(f"[배치 스코어링] 앨범 {album.albumId} 처리 실패: {e!r}")
+                return AlbumScoringResult(albumId=album.albumId, recommendedPhotoIds=[], error=type(e).__name__)
+
+    tasks = [asyncio.ensure_future(run_album(album)) for album in request.albums]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # 클라이언트가 연결을 끊으면 남은 앨범은 처리하지 않음
+        for task in tasks:
+            task.cancel()
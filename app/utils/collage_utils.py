@@ -0,0 +1,129 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from PIL import Image, ImageDraw, ImageFont
+from app.utils.image_utils import FONT, decode_image, encode_within_budget
+
+BG_COLOR = (255, 255, 255)
+LABEL_COLOR = (255, 0, 0)
+# 셀 좌상단 기준 번호 위치 (기존 annotate_image 와 동일)
+LABEL_OFFSET = (20, 15)
+REFERENCE_HEADER = "[REFERENCE IMAGES] Do NOT select any images from this collage."
+REFERENCE_HEADER_HEIGHT = 50
+
+
+class GlyphAtlas:
+    """
+    FONT 로 glyph 마스크를 한 번만 렌더링해 두고, 번호를 찍을 때는 마스크를 붙여넣기만 한다.
+    (썸네일마다 ImageDraw 로 텍스트를 그리지 않음)
+    """
+
+    def __init__(self, font: ImageFont.ImageFont, chars: str = "0123456789"):
+        self.font = font
+        self._masks: Dict[str, Image.Image] = {}
+        self._advances: Dict[str, int] = {}
+        for c in chars:
+            self.mask(c)
+
+    def mask(self, text: str) -> Image.Image:
+        if text not in self._masks:
+            _, _, right, bottom = self.font.getbbox(text)
+            advance = int(round(self.font.getlength(text)))
+            mask = Image.new("L", (max(right, advance, 1), max(bottom, 1)), 0)
+            ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=self.font)
+            self._masks[text] = mask
+            self._advances[text] = advance
+        return self._masks[text]
+
+    def stamp(self, canvas: Image.Image, text: str, xy: Tuple[int, int], color=LABEL_COLOR) -> None:
+        """문자 단위 glyph 를 이어 붙여 text 를 찍는다."""
+        x, y = xy
+        for c in text:
+            canvas.paste(color, (x, y), self.mask(c))
+            x += self._advances[c]
+
+    def stamp_line(self, canvas: Image.Image, text: str, xy: Tuple[int, int], color=LABEL_COLOR) -> None:
+        """고정 문구(헤더 등)는 문자열 전체를 하나의 마스크로 캐시해서 찍는다."""
+        canvas.paste(color, xy, self.mask(text))
+
+
+# 워커 프로세스/스레드마다 한 번만 생성
+_atlas: Optional[GlyphAtlas] = None
+
+
+def get_atlas() -> GlyphAtlas:
+    global _atlas
+    if _atlas is None:
+        _atlas = GlyphAtlas(FONT)
+    return _atlas
+
+
+def compose_collage(
+    images: Sequence[Image.Image],
+    labels: Optional[Sequence[int]] = None,
+    rows: int = 4,
+    cols: int = 4,
+    cell_size: Tuple[int, int] = (400, 400),
+    top_margin: int = 0,
+    header: Optional[str] = None,
+) -> Image.Image:
+    """
+    콜라주 캔버스를 한 번만 할당하고 각 이미지를 셀 중앙에 바로 붙여넣는다.
+    셀보다 큰 이미지만 리사이즈하며, 번호는 glyph atlas 로 찍는다.
+    """
+    cell_w, cell_h = cell_size
+    atlas = get_atlas()
+    width = cols * cell_w
+    if header:
+        # 좁은 격자에서도 헤더 문구가 잘리지 않도록 캔버스 폭을 맞춤
+        width = max(width, atlas.mask(header).width + 2 * LABEL_OFFSET[0])
+    canvas = Image.new("RGB", (width, rows * cell_h + top_margin), BG_COLOR)
+
+    for i, img in enumerate(images[:rows * cols]):
+        row, col = divmod(i, cols)
+        x0, y0 = col * cell_w, row * cell_h + top_margin
+        if img.width > cell_w or img.height > cell_h:
+            scale = min(cell_w / img.width, cell_h / img.height)
+            img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.Resampling.LANCZOS)
+        canvas.paste(img, (x0 + (cell_w - img.width) // 2, y0 + (cell_h - img.height) // 2))
+        if labels is not None:
+            atlas.stamp(canvas, str(labels[i]), (x0 + LABEL_OFFSET[0], y0 + LABEL_OFFSET[1]))
+
+    if header:
+        atlas.stamp_line(canvas, header, LABEL_OFFSET)
+    return canvas
+
+
+def _finish(collage: Image.Image, encoding: Optional[dict]):
+    # encoding 이 주어지면 워커 안에서 인코딩까지 끝내고 EncodedImage 를 반환
+    if encoding is None:
+        return collage
+    return encode_within_budget(collage, **encoding)
+
+
+def _cell_image(source: Union[bytes, Image.Image], cell_size) -> Image.Image:
+    # 분석 단계에서 이미 디코딩한 썸네일이면 셀 크기로 줄이기만 하고, 원본 bytes 면 셀 크기로 바로 디코딩
+    if isinstance(source, Image.Image):
+        img = source.copy()
+        img.thumbnail(cell_size, Image.Resampling.LANCZOS)
+        return img
+    return decode_image((source, None), max_size=cell_size)[0]
+
+
+# 아래 함수들은 디코딩 executor 에서 실행된다.
+# 썸네일(또는 원본 bytes)을 받아 셀 크기로 맞추고, 완성된 콜라주만 메인 프로세스로 돌려준다.
+def render_indexed_collage(items: List[Tuple[Union[bytes, Image.Image], int]], rows=4, cols=4, cell_size=(400, 400), encoding=None):
+    images = [_cell_image(source, cell_size) for source, _ in items]
+    labels = [idx for _, idx in items]
+    return _finish(compose_collage(images, labels, rows=rows, cols=cols, cell_size=cell_size), encoding)
+
+
+def render_reference_collage(contents: List[Union[bytes, Image.Image]], rows=3, cols=3, cell_size=(400, 450), encoding=None):
+    images = [_cell_image(source, cell_size) for source in contents]
+    collage = compose_collage(
+        images,
+        rows=rows,
+        cols=cols,
+        cell_size=cell_size,
+        top_margin=REFERENCE_HEADER_HEIGHT,
+        header=REFERENCE_HEADER,
+    )
+    return _finish(collage, encoding)
@@ -1,5 +1,5 @@
 import re
-from typing import List
+from typing import Dict, List, Tuple
 
 def group_consecutive(indices: List[int]) -> List[List[int]]:
     """연속된 숫자 그룹으로 묶기"""
@@ -44,4 +44,104 @@ def mark_by_sentence_indices(diary: str, target_indices: List[int]) -> str:
             i += 1
             idx += 1
 
-    return ' '.join(result)
\ No newline at end of file
+    return ' '.join(result)
+
+
+class TaggedSectionStream:
+    """
+    스트리밍 응답에서 <TAG> ... </TAG> 사이 텍스트만 조각 단위로 꺼낸다.
+    태그가 조각 경계에서 잘려도 되도록 닫는 태그 길이만큼은 보류했다가 내보낸다.
+    """
+
+    def __init__(self, tag: str = "DIARY"):
+        self.open_tag = f"<{tag}>"
+        self.close_tag = f"</{tag}>"
+        self.raw = ""        # 지금까지 받은 전체 응답
+        self._pending = ""   # 아직 내보내지 않은 섹션 텍스트
+        self.started = False
+        self.closed = False
+        self._emitted = False
+
+    def feed(self, chunk: str) -> str:
+        """새 조각을 받아 바로 내보낼 수 있는 섹션 텍스트를 반환"""
+        self.raw += chunk
+        if self.closed:
+            return ""
+        if not self.started:
+            start = self.raw.find(self.open_tag)
+            if start < 0:
+                return ""
+            self.started = True
+            self._pending = self.raw[start + len(self.open_tag):]
+        else:
+            self._pending += chunk
+        if not self._emitted:
+            # 여는 태그 뒤의 공백/줄바꿈은 버림
+            self._pending = self._pending.lstrip()
+        end = self._pending.find(self.close_tag)
+        if end >= 0:
+            self.closed = True
+            out, self._pending = self._pending[:end].rstrip(), ""
+        else:
+            # 닫는 태그의 앞부분일 수 있는 꼬리와 끝의 공백은 다음 조각까지 보류
+            split = len(self._pending) - (len(self.close_tag) - 1)
+            split = len(self._pending[:max(0, split)].rstrip())
+            out, self._pending = self._pending[:split], self._pending[split:]
+        self._emitted = self._emitted or bool(out)
+        return out
+
+    def flush(self) -> str:
+        """
+        스트림이 끝났을 때 호출. 닫는 태그 없이 끝났으면 (응답 잘림 등)
+        닫는 태그 후보로 보류해 둔 나머지 텍스트를 내보낸다.
+        """
+        if not self.started or self.closed:
+            return ""
+        self.closed = True
+        out, self._pending = self._pending.rstrip(), ""
+        if not self._emitted:
+            out = out.lstrip()
+        self._emitted = self._emitted or bool(out)
+        return out
+
+
+SENTENCE_PATTERN = re.compile(r'[^.!?…]+[.!?…]?')
+
+
+class SentenceIndex:
+    """
+    일기를 한 번만 문장 단위로 나눠 (시작, 끝) 오프셋을 저장한다.
+    문장 번호는 mark_by_sentence_indices 와 같이 1부터 시작한다.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.spans: List[Tuple[int, int]] = []
+        for match in SENTENCE_PATTERN.finditer(text):
+            sentence = match.group()
+            if not sentence.strip():
+                continue
+            # 문장 앞뒤 공백은 span 에서 제외 (splice 시 원래 공백 유지)
+            start = match.start() + len(sentence) - len(sentence.lstrip())
+            end = match.end() - (len(sentence) - len(sentence.rstrip()))
+            self.spans.append((start, end))
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def sentence(self, idx: int) -> str:
+        start, end = self.spans[idx - 1]
+        return self.text[start:end]
+
+    def joined(self, first: int, last: int) -> str:
+        """first~last 문장 구간의 원문 (사이 공백 포함)"""
+        return self.text[self.spans[first - 1][0]:self.spans[last - 1][1]]
+
+    def splice(self, replacements: Dict[Tuple[int, int], str]) -> str:
+        """{(first, last): 새 텍스트} 로 문장 구간들을 교체한 전체 텍스트"""
+        text = self.text
+        # 뒤쪽 구간부터 바꿔야 앞쪽 오프셋이 유지됨
+        for (first, last), new_text in sorted(replacements.items(), reverse=True):
+            start, end = self.spans[first - 1][0], self.spans[last - 1][1]
+            text = text[:start] + new_text.strip() + text[end:]
+        return text
@@ -0,0 +1,198 @@
+import asyncio
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import COLLAGE_MAX_CELL_PX, DECODE_WORKERS
+from app.core.executor import run_in_executor
+from app.utils.image_utils import decode_image
+
+# 분석용 디코딩 크기: 가장 큰 콜라주 셀 크기로 한 번만 디코딩해서 콜라주 셀로도 그대로 재사용
+# (JPEG draft 로 매우 싸게 디코딩됨)
+ANALYSIS_SIZE = (COLLAGE_MAX_CELL_PX, COLLAGE_MAX_CELL_PX)
+# 품질 지표는 고정 크기로 맞춰 배치 전체를 한 번에 계산
+QUALITY_SIZE = (224, 224)
+HASH_SIZE = 8
+HIST_BINS = 32
+# 색 히스토그램 (채널당 4단계, 4×4×4 = 64 bin)
+COLOR_LEVELS = 4
+
+
+@dataclass
+class ImageFeatures:
+    # (n, 64) bool, dHash 비트
+    hashes: np.ndarray
+    # (n,) 0~1, 높을수록 좋은 사진
+    quality: np.ndarray
+    # (n, 64) 정규화 RGB 색 히스토그램
+    colors: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "ImageFeatures":
+        return cls(
+            hashes=np.zeros((0, HASH_SIZE * HASH_SIZE), dtype=bool),
+            quality=np.zeros(0),
+            colors=np.zeros((0, COLOR_LEVELS ** 3)),
+        )
+
+    @classmethod
+    def concat(cls, parts: List["ImageFeatures"]) -> "ImageFeatures":
+        return cls(
+            hashes=np.concatenate([p.hashes for p in parts]),
+            quality=np.concatenate([p.quality for p in parts]),
+            colors=np.concatenate([p.colors for p in parts]),
+        )
+
+    def take(self, indices) -> "ImageFeatures":
+        indices = np.asarray(list(indices), dtype=np.int64)
+        return ImageFeatures(hashes=self.hashes[indices], quality=self.quality[indices], colors=self.colors[indices])
+
+
+def dhash(gray: np.ndarray) -> np.ndarray:
+    """(n, H, H+1) 그레이스케일 배열 -> (n, H*H) bool dHash (가로 방향 밝기 차이)"""
+    return (gray[:, :, 1:] > gray[:, :, :-1]).reshape(len(gray), -1)
+
+
+def luminance_histograms(gray: np.ndarray, bins: int = HIST_BINS) -> np.ndarray:
+    """(n, H, W) 0~1 밝기 -> (n, bins) 정규화 히스토그램"""
+    n = len(gray)
+    idx = np.minimum((gray * bins).astype(np.int64), bins - 1).reshape(n, -1)
+    idx += (np.arange(n) * bins)[:, None]
+    counts = np.bincount(idx.ravel(), minlength=n * bins).reshape(n, bins)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+
+def color_histograms(rgb: np.ndarray, levels: int = COLOR_LEVELS) -> np.ndarray:
+    """(n, H, W, 3) uint8 -> (n, levels^3) 정규화 RGB 히스토그램"""
+    n = len(rgb)
+    q = (rgb.astype(np.int64) * levels) // 256
+    idx = (q[..., 0] * levels + q[..., 1]) * levels + q[..., 2]
+    idx = idx.reshape(n, -1) + (np.arange(n) * levels ** 3)[:, None]
+    counts = np.bincount(idx.ravel(), minlength=n * levels ** 3).reshape(n, -1)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+
+def quality_scores(rgb: np.ndarray) -> np.ndarray:
+    """
+    (n, H, W, 3) uint8 -> (n,) 0~1 품질 점수
+    - 선명도: 라플라시안 분산
+    - 노출/대비: 밝기 히스토그램 (평균, 클리핑 비율, 5~95 분위 폭)
+    - 색감: Hasler–Süsstrunk colourfulness
+    """
+    rgb = rgb.astype(np.float32)
+    gray = (rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)) / 255.0
+
+    laplacian = (
+        gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+        - 4 * gray[:, 1:-1, 1:-1]
+    )
+    sharpness = np.clip(np.log1p(laplacian.var(axis=(1, 2)) * 1e4) / np.log1p(1e2), 0, 1)
+
+    hist = luminance_histograms(gray)
+    centers = (np.arange(HIST_BINS) + 0.5) / HIST_BINS
+    mean = hist @ centers
+    clipped = hist[:, 0] + hist[:, -1]
+    exposure = np.clip(1 - 2 * np.abs(mean - 0.5) - clipped, 0, 1)
+    cdf = hist.cumsum(axis=1)
+    spread = ((cdf < 0.95).sum(axis=1) - (cdf < 0.05).sum(axis=1)) / HIST_BINS
+    contrast = np.clip(spread / 0.6, 0, 1)
+
+    rg = rgb[..., 0] - rgb[..., 1]
+    yb = 0.5 * (rgb[..., 0] + rgb[..., 1]) - rgb[..., 2]
+    colourfulness = (
+        np.sqrt(rg.var(axis=(1, 2)) + yb.var(axis=(1, 2)))
+        + 0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2)
+    )
+    colour = np.clip(colourfulness / 100.0, 0, 1)
+
+    return 0.4 * sharpness + 0.25 * exposure + 0.2 * contrast + 0.15 * colour
+
+
+def analyze_contents(contents: List[bytes]) -> Tuple[ImageFeatures, List[Image.Image]]:
+    """
+    디코딩 executor 에서 실행. 작은 썸네일로 디코딩 후 배치 단위로 특징을 계산한다.
+    디코딩한 썸네일도 함께 돌려줘서 콜라주가 원본을 다시 디코딩하지 않게 한다.
+    """
+    thumbs = []
+    grays = np.empty((len(contents), HASH_SIZE, HASH_SIZE + 1), dtype=np.float32)
+    rgbs = np.empty((len(contents), QUALITY_SIZE[1], QUALITY_SIZE[0], 3), dtype=np.uint8)
+    for i, content in enumerate(contents):
+        thumb, _ = decode_image((content, None), max_size=ANALYSIS_SIZE)
+        thumbs.append(thumb)
+        grays[i] = np.asarray(thumb.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX))
+        rgbs[i] = np.asarray(thumb.resize(QUALITY_SIZE, Image.Resampling.BILINEAR))
+    features = ImageFeatures(hashes=dhash(grays), quality=quality_scores(rgbs), colors=color_histograms(rgbs))
+    return features, thumbs
+
+
+async def analyze_images(contents: List[bytes]) -> Tuple[ImageFeatures, List[Image.Image]]:
+    """워커 수만큼 나눠서 병렬로 분석한 뒤 합친다. (특징, 디코딩된 썸네일) 을 반환."""
+    if not contents:
+        return ImageFeatures.empty(), []
+    chunk = -(-len(contents) // DECODE_WORKERS)
+    parts = await asyncio.gather(*(
+        run_in_executor(analyze_contents, contents[i:i + chunk])
+        for i in range(0, len(contents), chunk)
+    ))
+    return ImageFeatures.concat([f for f, _ in parts]), [thumb for _, thumbs in parts for thumb in thumbs]
+
+
+def hamming_matrix(hashes: np.ndarray) -> np.ndarray:
+    """(n, bits) bool -> (n, n) 해밍 거리"""
+    return (hashes[:, None, :] != hashes[None, :, :]).sum(axis=-1)
+
+
+def cluster_near_duplicates(hashes: np.ndarray, threshold: int) -> List[List[int]]:
+    """
+    입력 순서대로 훑으며 아직 묶이지 않은 이미지를 대표로 삼고,
+    대표와의 해밍 거리가 threshold 이하인 이미지를 같은 묶음으로 모은다.
+    (대표 기준으로 묶기 때문에 조금씩 다른 사진이 길게 이어 붙는 체이닝이 없음)
+    """
+    distances = hamming_matrix(hashes)
+    assigned = np.zeros(len(hashes), dtype=bool)
+    clusters = []
+    for i in range(len(hashes)):
+        if assigned[i]:
+            continue
+        members = np.flatnonzero((distances[i] <= threshold) & ~assigned)
+        assigned[members] = True
+        clusters.append(members.tolist())
+    return clusters
+
+
+def similarity_matrix(features: ImageFeatures) -> np.ndarray:
+    """색 히스토그램 교집합과 dHash 일치율의 평균 (n, n), 0~1"""
+    colors = np.minimum(features.colors[:, None, :], features.colors[None, :, :]).sum(axis=-1)
+    hashes = 1 - hamming_matrix(features.hashes) / features.hashes.shape[1]
+    return 0.5 * colors + 0.5 * hashes
+
+
+def select_diverse(
+    features: ImageFeatures,
+    candidates: List[int],
+    k: int,
+    preselected: List[int] = (),
+    diversity: float = 0.3,
+) -> List[int]:
+    """
+    Maximal marginal relevance 로 품질이 좋으면서 서로(및 preselected)와 덜 비슷한 k 장을 고른다.
+    동점은 인덱스 순으로 처리되어 같은 입력이면 항상 같은 결과를 낸다.
+    """
+    similarity = similarity_matrix(features)
+    chosen = list(preselected)
+    remaining = list(candidates)
+    picked = []
+    while remaining and len(picked) < k:
+        rel = features.quality[remaining]
+        if chosen:
+            penalty = similarity[np.ix_(remaining, chosen)].max(axis=1)
+        else:
+            penalty = np.zeros(len(remaining))
+        scores = (1 - diversity) * rel - diversity * penalty
+        best = remaining[int(np.argmax(scores))]
+        picked.append(best)
+        chosen.append(best)
+        remaining.remove(best)
+    return picked
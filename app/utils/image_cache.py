@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import (
+    IMAGE_CACHE_MEMORY_BYTES,
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_DISK_BYTES,
+    IMAGE_CACHE_URL_TTL_SECONDS,
+)
+from app.core.logger import logger
+
+RAW = "raw"
+URL_INDEX_MAX_ENTRIES = 10000
+
+
+class ImageCache:
+    """
+    URL -> content hash -> bytes 2단계 캐시.
+
+    - 원본 bytes 와 파생 결과(썸네일/인코딩)를 content hash + variant 로 저장
+    - 메모리 LRU (바이트 상한) + 선택적 디스크 계층 (용량 초과 시 오래된 파일부터 삭제)
+    - 같은 URL 을 동시에 요청하면 다운로드 한 번을 공유
+    """
+
+    def __init__(self, memory_bytes: int, disk_dir: Optional[str] = None, disk_bytes: int = 0,
+                 url_ttl: float = IMAGE_CACHE_URL_TTL_SECONDS):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.url_ttl = url_ttl
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._urls: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._disk_used = 0
+        # 디스크 쓰기/정리는 executor 스레드에서 동시에 실행되므로 사용량 갱신과 eviction 을 직렬화
+        self._disk_lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "disk_evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_used = sum(entry.stat().st_size for entry in os.scandir(disk_dir) if entry.is_file())
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    async def fetch(self, url: str, download: Callable[[str], Awaitable[bytes]]) -> Tuple[str, bytes]:
+        """URL 의 (content hash, bytes) 반환. 캐시에 없으면 download(url) 로 받아 저장한다."""
+        digest = self._lookup_url(url)
+        if digest:
+            content = await self.get(RAW, digest)
+            if content is not None:
+                return digest, content
+
+        task = self._inflight.get(url)
+        if task is None:
+            # 요청한 쪽이 취소되어도 다운로드는 다른 대기자를 위해 계속 진행
+            task = asyncio.ensure_future(self._download(url, download))
+            self._inflight[url] = task
+            task.add_done_callback(lambda t: self._on_download_done(url, t))
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def _download(self, url: str, download: Callable[[str], Awaitable[bytes]]) -> Tuple[str, bytes]:
+        content = await download(url)
+        digest = self.digest(content)
+        self._urls[url] = (digest, time.monotonic() + self.url_ttl)
+        self._urls.move_to_end(url)
+        while len(self._urls) > URL_INDEX_MAX_ENTRIES:
+            self._urls.popitem(last=False)
+        await self.put(RAW, digest, content)
+        return digest, content
+
+    def _on_download_done(self, url: str, task: asyncio.Task) -> None:
+        self._inflight.pop(url, None)
+        if not task.cancelled():
+            task.exception()  # 대기자가 모두 취소된 경우 "never retrieved" 경고 방지
+
+    async def get(self, variant: str, digest: str) -> Optional[bytes]:
+        key = f"{variant}/{digest}"
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.counters["hits"] += 1
+            return data
+        if self.disk_dir:
+            data = await asyncio.to_thread(self._disk_read, key)
+            if data is not None:
+                self.counters["disk_hits"] += 1
+                self._memory_put(key, data)
+                return data
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, variant: str, digest: str, data: bytes) -> None:
+        key = f"{variant}/{digest}"
+        self._memory_put(key, data)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_write, key, data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "disk_bytes": self._disk_used,
+            "inflight": len(self._inflight),
+        }
+
+    def url_digest(self, url: str) -> Optional[str]:
+        """이미 받은 URL 의 content hash (없거나 만료되었으면 None)"""
+        return self._lookup_url(url)
+
+    def _lookup_url(self, url: str) -> Optional[str]:
+        entry = self._urls.get(url)
+        if entry is None:
+            return None
+        digest, expires = entry
+        if expires < time.monotonic():
+            del self._urls[url]
+            return None
+        return digest
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= len(old)
+        self._memory[key] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key.replace("/", "_"))
+
+    def _disk_read(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # LRU 순서를 위해 mtime 갱신
+            return data
+        except FileNotFoundError:
+            return None
+
+    def _disk_write(self, key: str, data: bytes) -> None:
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._disk_lock:
+            # 파일 교체도 잠금 안에서 해야 정리 중인 스캔과 사용량이 이중으로 잡히지 않음
+            os.replace(tmp_path, path)
+            self._disk_used += len(data)
+            if self._disk_used > self.disk_bytes:
+                self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        """_disk_lock 을 잡은 상태에서 호출"""
+        entries = sorted(
+            # 다른 스레드가 쓰는 중인 임시 파일은 제외
+            (entry for entry in os.scandir(self.disk_dir) if entry.is_file() and ".tmp" not in entry.name),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        self._disk_used = sum(entry.stat().st_size for entry in entries)
+        # 상한의 90% 까지 비워서 매 쓰기마다 eviction 이 일어나지 않게 함
+        target = self.disk_bytes * 0.9
+        for entry in entries:
+            if self._disk_used <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._disk_used -= size
+                self.counters["disk_evictions"] += 1
+            except FileNotFoundError:
+                continue
+        logger.info(f"[image cache] 디스크 정리 완료: {self._disk_used} bytes")
+
+
+image_cache = ImageCache(
+    memory_bytes=IMAGE_CACHE_MEMORY_BYTES,
+    disk_dir=IMAGE_CACHE_DIR or None,
+    disk_bytes=IMAGE_CACHE_DISK_BYTES,
+)
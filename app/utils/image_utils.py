@@ -1,12 +1,13 @@
 from PIL import Image, ImageDraw, ImageFont
-from typing import List, Tuple
+from typing import Optional, Tuple
+from dataclasses import dataclass
 from io import BytesIO
 import base64
-import requests
-import aiohttp
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
-from app.schemas.image_schema import PhotoInput
+import time
+from app.core.executor import run_in_executor
+from app.core.http import download_client
+from app.utils.image_cache import image_cache
 from app.core.logger import logger
 
 try:
@@ -16,18 +17,6 @@ except IOError:
     FONT = ImageFont.load_default()
 
 
-def load_images_from_urls(image_urls: List[PhotoInput]):
-    loaded = []
-    for photos in image_urls:
-        try:
-            logger.info(f"이미지 요청: {photos.id}")
-            response = requests.get(photos.photoUrl)
-            img = Image.open(BytesIO(response.content)).convert("RGB")
-            loaded.append((img, photos.id))
-        except Exception as e:
-            logger.error(f"이미지 로딩 실패: {photos.id}, 오류: {e}")
-    return loaded
-
 # 이미지 크기 조정 및 패딩 추가 함수
 def make_thumbnail_with_padding(img: Image.Image, target_size=(400, 400), bg_color=(255, 255, 255)) -> Image.Image:
     img_copy = img.copy()
@@ -97,24 +86,64 @@ def create_reference_collage(reference_images):
     indexed = [(img, idx) for idx, img in enumerate(reference_images, start=1)]
     return create_collage_with_padding(indexed, rows=3, cols=3, thumb_size=(400, 400))
 
-# GPT용 message 작성 함수
+@dataclass
+class EncodedImage:
+    data: bytes
+    mime_type: str
+    quality: Optional[int] = None
+    encode_seconds: float = 0.0
+    # 인코딩된 이미지 크기 (토큰 추정용, 다시 열어보지 않아도 되도록)
+    width: int = 0
+    height: int = 0
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64," + base64.b64encode(self.data).decode()
+
+def encode_image(img: Image.Image, fmt: str = "jpeg", quality: int = 85) -> bytes:
+    buffer = BytesIO()
+    if fmt == "jpeg":
+        # 4:4:4 로 저장해야 작은 빨간 번호가 번지지 않음
+        img.save(buffer, format="JPEG", quality=quality, subsampling=0)
+    elif fmt == "webp":
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def encode_within_budget(img: Image.Image, fmt: str, quality: int, min_quality: int, max_bytes: Optional[int]) -> EncodedImage:
+    """quality 부터 10씩 낮춰가며 max_bytes 안에 들어오는 첫 결과를 반환 (최저 min_quality)"""
+    start = time.perf_counter()
+    data = encode_image(img, fmt, quality)
+    if fmt != "png" and max_bytes:
+        while len(data) > max_bytes and quality > min_quality:
+            quality = max(min_quality, quality - 10)
+            data = encode_image(img, fmt, quality)
+    return EncodedImage(
+        data=data,
+        mime_type=f"image/{fmt}",
+        quality=quality if fmt != "png" else None,
+        encode_seconds=time.perf_counter() - start,
+        width=img.width,
+        height=img.height,
+    )
+
+def _image_data_url(img) -> str:
+    if isinstance(img, EncodedImage):
+        return img.data_url
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+# GPT용 message 작성 함수 (이미지는 PIL 이미지 또는 EncodedImage)
 def build_message(prompt: str, images, collage_ref=None):
     msg = [{"role":"user", "content":[{"type":"input_text", "text":prompt}]}]
     for img in images:
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        data_url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
-        msg[0]["content"].append({"type":"input_image","image_url":data_url})
+        msg[0]["content"].append({"type":"input_image","image_url":_image_data_url(img)})
     if collage_ref:
-        buffer = BytesIO()
-        collage_ref.save(buffer, format="PNG")
-        data_url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
-        msg[0]["content"].append({"type":"input_image","image_url":data_url})
+        msg[0]["content"].append({"type":"input_image","image_url":_image_data_url(collage_ref)})
     return msg
 
-def build_message_gemini(prompt: str, images, collage_ref=None):
-    return prompt
-
 # # 1. 비동기로 이미지 다운로드
 # async def fetch_image(photo):
 #     async with aiohttp.ClientSession() as session:
@@ -123,10 +152,30 @@ def build_message_gemini(prompt: str, images, collage_ref=None):
 #             return (content, photo.id)
 
 # 2. 병렬로 이미지 디코딩 (CPU-bound)
-def decode_image(content_and_id):
+# 콜라주 셀(400×400) 크기까지만 디코딩해서 원본 해상도와 무관하게 메모리 사용량을 고정
+DECODE_MAX_SIZE = (400, 400)
+
+def decode_image(content_and_id, max_size=DECODE_MAX_SIZE):
     content, id_ = content_and_id
-    img = Image.open(BytesIO(content)).convert("RGB")
-    return (img, id_)
+    img = Image.open(BytesIO(content))
+    # JPEG 는 DCT 스케일링(1/2 ~ 1/8)으로 원본 크기 버퍼 없이 바로 작게 디코딩
+    img.draft("RGB", max_size)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    # JPEG 가 아니거나 draft 후에도 큰 경우 정수 배율로 축소
+    factor = max(img.width // max_size[0], img.height // max_size[1])
+    if factor >= 2:
+        img = img.reduce(factor)
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return (img.convert("RGB"), id_)
+
+def encode_reduced(content: bytes, max_size: Tuple[int, int], fmt: str = "jpeg", quality: int = 85) -> EncodedImage:
+    """
+    원본 bytes 를 max_size 안으로 draft 디코딩해서 (확대는 하지 않음) fmt/quality 로 인코딩한다.
+    executor 에서 실행된다.
+    """
+    img, _ = decode_image((content, None), max_size=max_size)
+    return encode_within_budget(img, fmt, quality, quality, None)
 
 # # 3. 전체 처리 함수
 # async def load_and_decode_images(photo_list):
@@ -140,20 +189,21 @@ def decode_image(content_and_id):
 
 #     return decoded
 
-async def fetch_image(photo, session):
-    async with session.get(str(photo.photoUrl)) as resp:
-        logger.info(f"이미지 요청: {photo.id}")
-        content = await resp.read()
-        return (content, photo.id)
+async def fetch_image(photo):
+    logger.info(f"이미지 요청: {photo.id}")
+    _, content = await image_cache.fetch(str(photo.photoUrl), download_client.get_bytes)
+    return (content, photo.id)
+
+async def decode_images(contents):
+    # 공유 executor 에서 병렬 디코딩 (이벤트 루프는 막지 않음)
+    return await asyncio.gather(*(run_in_executor(decode_image, c) for c in contents))
+
+async def download_images(photo_list):
+    # 공유 다운로드 클라이언트 사용 (커넥션 풀/타임아웃/크기 제한은 app.core.http 에서 관리)
+    return await asyncio.gather(*(fetch_image(photo) for photo in photo_list))
 
 async def load_and_decode_images(photo_list):
-    conn = aiohttp.TCPConnector(limit=15)
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_image(photo, session) for photo in photo_list]
-        contents = await asyncio.gather(*tasks)
-
-    with ProcessPoolExecutor(max_workers = 4) as executor:
-        decoded = list(executor.map(decode_image, contents))
-    return decoded
+    contents = await download_images(photo_list)
+    return await decode_images(contents)
 
 
@@ -0,0 +1,116 @@
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.core.config import (
+    COLLAGE_TOKEN_BUDGET,
+    COLLAGE_MIN_CELL_PX,
+    COLLAGE_MAX_CELL_PX,
+    SCORER_MODEL,
+)
+
+MAX_GRID = 8
+# 예산을 맞추려고 셀을 줄일 때의 하한 (이보다 작으면 번호/피사체 식별이 어려움)
+MIN_CELL_FLOOR = 96
+# provider 쪽 리사이즈 규칙 (OpenAI high detail): 2048 박스 안으로, 짧은 변 768 이하로
+PROVIDER_MAX_SIDE = 2048
+PROVIDER_SHORT_SIDE = 768
+TILE = 512
+# 32px 패치 기반으로 과금되는 모델과 토큰 배율
+PATCH_MODELS = {"gpt-4.1-mini": 1.62, "gpt-4.1-nano": 2.46, "o4-mini": 1.72}
+
+
+def provider_size(width: int, height: int) -> Tuple[int, int]:
+    """provider 가 실제로 모델에 넣는 해상도 (이보다 큰 픽셀은 업로드해도 버려짐)"""
+    scale = min(1.0, PROVIDER_MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, PROVIDER_SHORT_SIDE / min(width, height))
+    return int(width * scale), int(height * scale)
+
+
+def estimate_image_tokens(width: int, height: int, model: str = SCORER_MODEL) -> int:
+    """이미지 한 장의 과금 토큰 추정치"""
+    if model in PATCH_MODELS:
+        patches = min(1536, math.ceil(width / 32) * math.ceil(height / 32))
+        return math.ceil(patches * PATCH_MODELS[model])
+    width, height = provider_size(width, height)
+    return 85 + 170 * math.ceil(width / TILE) * math.ceil(height / TILE)
+
+
+@dataclass(frozen=True)
+class CollageLayout:
+    rows: int
+    cols: int
+    cell: int
+    count: int
+    num_images: int
+    top_margin: int = 0
+    model: str = SCORER_MODEL
+
+    @property
+    def capacity(self) -> int:
+        return self.rows * self.cols
+
+    def collage_sizes(self) -> List[Tuple[int, int]]:
+        """콜라주별 픽셀 크기 (마지막 콜라주는 필요한 행만큼만)"""
+        sizes = []
+        for i in range(self.count):
+            n = min(self.capacity, self.num_images - i * self.capacity)
+            rows = math.ceil(n / self.cols)
+            sizes.append((self.cols * self.cell, rows * self.cell + self.top_margin))
+        return sizes
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_image_tokens(w, h, self.model) for w, h in self.collage_sizes())
+
+    @property
+    def pixels(self) -> int:
+        return sum(w * h for w, h in self.collage_sizes())
+
+    def __str__(self) -> str:
+        return f"{self.count}×({self.rows}x{self.cols}@{self.cell}px)"
+
+
+def candidate_layouts(n: int, min_cell: int, max_cell: int, top_margin: int, model: str):
+    for rows in range(1, MAX_GRID + 1):
+        for cols in range(1, MAX_GRID + 1):
+            count = math.ceil(n / (rows * cols))
+            # 콜라주가 한 장인데 빈 행이 생기는 격자는 제외
+            if count == 1 and rows > math.ceil(n / cols):
+                continue
+            # provider 가 줄이지 않는 최대 셀 크기 (짧은 변 512 / 768 두 가지)
+            for short_side in (TILE, PROVIDER_SHORT_SIDE):
+                cell = min(max_cell, short_side // min(rows, cols), PROVIDER_MAX_SIDE // max(rows, cols))
+                if cell < min_cell:
+                    continue
+                yield CollageLayout(rows, cols, cell, count, n, top_margin, model)
+
+
+def plan_layout(
+    n: int,
+    token_budget: Optional[int] = COLLAGE_TOKEN_BUDGET,
+    min_cell: int = COLLAGE_MIN_CELL_PX,
+    max_cell: int = COLLAGE_MAX_CELL_PX,
+    top_margin: int = 0,
+    model: str = SCORER_MODEL,
+) -> CollageLayout:
+    """
+    n 장을 담을 격자/셀 크기/콜라주 수를 고른다.
+    셀이 min_cell 이상인 배치 중 예상 토큰이 가장 적은 것 (동률이면 셀이 큰 것, 업로드 픽셀이 적은 것).
+    그래도 token_budget 을 넘으면 셀 하한을 낮춰 가며 예산 안에 드는 배치를 찾는다.
+    """
+    n = max(n, 1)
+
+    def best(cell_floor: int) -> Optional[CollageLayout]:
+        layouts = list(candidate_layouts(n, cell_floor, max_cell, top_margin, model))
+        if not layouts:
+            return None
+        return min(layouts, key=lambda l: (l.tokens, -l.cell, l.count, l.pixels))
+
+    layout = best(min_cell)
+    floor = min_cell
+    while (layout is None or (token_budget and layout.tokens > token_budget)) and floor > MIN_CELL_FLOOR:
+        floor = max(MIN_CELL_FLOOR, floor * 3 // 4)
+        layout = best(floor) or layout
+    return layout
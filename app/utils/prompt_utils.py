@@ -0,0 +1,28 @@
+import hashlib
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    고정 지시문(prefix) + 요청별 내용(suffix) 으로 나눈 프롬프트.
+
+    provider 의 prompt caching 은 요청 앞부분이 바이트 단위로 같아야 적용되므로
+    사용자 데이터(말투, 일기, 개수 등)는 모두 suffix 의 format 필드로만 넣는다.
+    prefix 는 import 시 한 번 만들어진 문자열을 그대로 재사용한다.
+    """
+    name: str
+    prefix: str
+    suffix: str
+
+    def render(self, **values) -> str:
+        return self.prefix + self.suffix.format(**values)
+
+    def extend(self, name: str, instructions: str) -> "PromptTemplate":
+        """고정 지시문을 prefix 끝에 추가한 새 템플릿 (요청별 내용은 계속 마지막에 옴)"""
+        return PromptTemplate(name=name, prefix=self.prefix + instructions, suffix=self.suffix)
+
+    @property
+    def version(self) -> str:
+        """템플릿이 바뀌면 달라지는 짧은 해시 (캐시 키 등에 사용)"""
+        return hashlib.sha256((self.prefix + "\0" + self.suffix).encode()).hexdigest()[:12]
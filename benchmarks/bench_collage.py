@@ -0,0 +1,59 @@
+"""
+콜라주 합성 micro-benchmark
+
+같은 400px 썸네일 16장(참조 9장)으로 기존 create_collage_with_padding /
+create_collage_with_padding_refIMG 와 compose_collage 를 비교한다.
+
+실행: python -m benchmarks.bench_collage
+"""
+import os
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from PIL import Image  # noqa: E402
+
+from app.utils.image_utils import create_collage_with_padding, create_collage_with_padding_refIMG  # noqa: E402
+from app.utils.collage_utils import (  # noqa: E402
+    REFERENCE_HEADER,
+    REFERENCE_HEADER_HEIGHT,
+    compose_collage,
+    get_atlas,
+)
+
+REPEAT = 20
+
+
+def make_thumbs(n):
+    return [
+        Image.effect_mandelbrot((400, 300), (-2 + i * 0.05, -1.2, 1, 1.2), 32).convert("RGB")
+        for i in range(n)
+    ]
+
+
+def bench(label, fn):
+    seconds = min(timeit.repeat(fn, number=REPEAT, repeat=3)) / REPEAT
+    print(f"{label:>28}: {seconds * 1000:7.2f} ms")
+
+
+def main():
+    thumbs = make_thumbs(16)
+    indexed = [(img, idx) for idx, img in enumerate(thumbs, start=1)]
+    labels = list(range(1, 17))
+    refs = thumbs[:9]
+    get_atlas()  # 워커 시작 시 1회 생성되는 비용은 제외
+
+    print("4x4 collage (400x400 cells)")
+    bench("create_collage_with_padding", lambda: create_collage_with_padding(indexed, rows=4, cols=4))
+    bench("compose_collage", lambda: compose_collage(thumbs, labels, rows=4, cols=4))
+
+    print("3x3 reference collage (400x450 cells)")
+    bench("..._with_padding_refIMG", lambda: create_collage_with_padding_refIMG(indexed[:9], rows=3, cols=3))
+    bench("compose_collage", lambda: compose_collage(
+        refs, rows=3, cols=3, cell_size=(400, 450), top_margin=REFERENCE_HEADER_HEIGHT, header=REFERENCE_HEADER,
+    ))
+
+
+if __name__ == "__main__":
+    main()
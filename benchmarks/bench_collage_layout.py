@@ -0,0 +1,57 @@
+"""
+콜라주 배치별 이미지 토큰/업로드 크기 비교
+
+후보 수마다 기존 고정 배치(4x4 @ 400px)와 plan_layout 이 고른 배치의
+예상 토큰, 업로드 픽셀, 실제 JPEG 바이트를 비교한다.
+
+실행: python -m benchmarks.bench_collage_layout
+"""
+import math
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from PIL import Image  # noqa: E402
+
+from app.core.config import COLLAGE_FORMAT, COLLAGE_QUALITY  # noqa: E402
+from app.utils.collage_utils import compose_collage  # noqa: E402
+from app.utils.image_utils import encode_image  # noqa: E402
+from app.utils.layout_utils import CollageLayout, plan_layout  # noqa: E402
+
+COUNTS = (5, 9, 16, 17, 24, 32, 48, 64)
+
+
+def make_thumbs(n):
+    return [
+        Image.effect_mandelbrot((400, 300), (-2 + i * 0.02, -1.2, 1, 1.2), 32).convert("RGB")
+        for i in range(n)
+    ]
+
+
+def upload_bytes(layout: CollageLayout, thumbs, shrink_last=True):
+    total = 0
+    for i in range(layout.count):
+        chunk = thumbs[i * layout.capacity:(i + 1) * layout.capacity]
+        rows = math.ceil(len(chunk) / layout.cols) if shrink_last else layout.rows
+        collage = compose_collage(chunk, list(range(1, len(chunk) + 1)), rows=rows, cols=layout.cols,
+                                  cell_size=(layout.cell, layout.cell))
+        total += len(encode_image(collage, COLLAGE_FORMAT, COLLAGE_QUALITY))
+    return total
+
+
+def main():
+    thumbs = make_thumbs(max(COUNTS))
+    print(f"{'n':>3} | {'layout':>20} {'tokens':>7} {'KB':>7} | {'fixed 4x4@400':>20} {'tokens':>7} {'KB':>7}")
+    for n in COUNTS:
+        planned = plan_layout(n)
+        # 기존 방식: 빈 칸이 있어도 항상 1600x1600 전체를 전송
+        fixed = CollageLayout(rows=4, cols=4, cell=400, count=math.ceil(n / 16), num_images=math.ceil(n / 16) * 16)
+        print(
+            f"{n:>3} | {str(planned):>20} {planned.tokens:>7} {upload_bytes(planned, thumbs[:n]) / 1024:>7.0f} | "
+            f"{str(fixed):>20} {fixed.tokens:>7} {upload_bytes(fixed, thumbs[:n], shrink_last=False) / 1024:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+요청당 디코딩 지연 벤치마크
+
+- per-request : 기존 방식처럼 요청마다 ProcessPoolExecutor 를 새로 생성/종료
+- process     : lifespan 에서 만든 공유 ProcessPoolExecutor
+- thread      : lifespan 에서 만든 공유 ThreadPoolExecutor
+
+실행: python -m benchmarks.bench_decode_executor
+"""
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from PIL import Image  # noqa: E402
+
+from app.core import executor as executor_module  # noqa: E402
+from app.utils.image_utils import decode_image, decode_images  # noqa: E402
+
+IMAGES_PER_REQUEST = 16
+REQUESTS = 5
+IMAGE_SIZE = (2000, 1500)
+
+
+def make_contents():
+    contents = []
+    for i in range(IMAGES_PER_REQUEST):
+        img = Image.effect_mandelbrot(IMAGE_SIZE, (-2 + i * 0.01, -1.2, 1, 1.2), 64).convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=90)
+        contents.append((buffer.getvalue(), i))
+    return contents
+
+
+async def per_request(contents):
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        return list(pool.map(decode_image, contents))
+
+
+async def measure(fn, contents):
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        await fn(contents)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+async def main():
+    executor_module.logger.disabled = True
+    contents = make_contents()
+    print(f"{IMAGES_PER_REQUEST} images/request, {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]} JPEG, median of {REQUESTS}")
+    print(f"{'per-request':>12}: {await measure(per_request, contents):8.1f} ms")
+    for backend in ("process", "thread"):
+        executor_module._executor = executor_module.create_executor(backend=backend)
+        await decode_images(contents[:1])  # 워커 warm-up (lifespan 시점에 해당)
+        latency = await measure(decode_images, contents)
+        executor_module.shutdown_executor()
+        print(f"{backend:>12}: {latency:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+원본 해상도별 /score 디코딩 단계 peak RSS 측정
+
+앨범 1개(48장)를 디코딩하고 결과를 요청 동안처럼 모두 들고 있을 때의 peak RSS 증가량을
+기존 전체 해상도 디코딩(full)과 decode_image(reduced)로 비교한다.
+(조합마다 별도 프로세스에서 측정)
+
+실행: python -m benchmarks.bench_decode_memory
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+
+ALBUM_SIZE = 48
+RESOLUTIONS = [(1000, 750), (2000, 1500), (4000, 3000)]
+
+
+def run_one(path: str, mode: str) -> None:
+    from PIL import Image
+    from app.utils.image_utils import decode_image
+
+    with open(path, "rb") as f:
+        content = f.read()
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if mode == "full":
+        decoded = [Image.open(BytesIO(content)).convert("RGB") for _ in range(ALBUM_SIZE)]
+    else:
+        decoded = [decode_image((content, i))[0] for i in range(ALBUM_SIZE)]
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:>8}: +{(peak - baseline) / 1024:7.1f} MB peak RSS, size={decoded[0].size}")
+
+
+def main() -> None:
+    from PIL import Image
+
+    env = {**os.environ, "OPENAI_API_KEY": "bench", "GOOGLE_API_KEY": "bench", "PYTHONWARNINGS": "ignore"}
+    print(f"album of {ALBUM_SIZE} JPEGs")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in RESOLUTIONS:
+            path = os.path.join(tmp, f"{width}x{height}.jpg")
+            Image.effect_mandelbrot((width, height), (-2, -1.2, 1, 1.2), 32).convert("RGB").save(path, quality=90)
+            print(f"{width}x{height}")
+            for mode in ("full", "reduced"):
+                subprocess.run([sys.executable, "-m", "benchmarks.bench_decode_memory", path, mode], env=env, check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        run_one(sys.argv[1], sys.argv[2])
+    else:
+        main()
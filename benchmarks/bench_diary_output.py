@@ -0,0 +1,53 @@
+"""
+일기 생성 응답 방식별 지연 시간 비교 (로컬 stub provider 사용, 네트워크 호출 없음)
+
+- two_call   : 일기 생성 호출 후 감정 분류 호출 (순차 2회)
+- structured : 일기 + 감정 라벨을 JSON 으로 한 번에
+
+이미지 없이 프롬프트만 보내므로 차이는 provider 왕복 횟수에서만 생긴다.
+
+실행: python -m benchmarks.bench_diary_output
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ["LLM_PROVIDER"] = "stub"
+
+from app.core import llm  # noqa: E402
+from app.schemas.diary_schema import DiaryRequest  # noqa: E402
+from app.services import diary_service  # noqa: E402
+
+LATENCIES = (0.2, 0.8)
+REPEAT = 10
+
+
+async def measure(mode: str) -> list:
+    diary_service.DIARY_OUTPUT_MODE = mode
+    req = DiaryRequest(user_speech="오늘 진짜 재밌었음ㅋㅋ", image_info=[])
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        await diary_service.generate_diary_by_ai(req)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main():
+    llm.logger.disabled = True
+    print(f"{'stub latency':>12} | {'two_call p50':>12} | {'structured p50':>14}")
+    for latency in LATENCIES:
+        llm.register_provider("stub", llm.StubProvider(latency=latency))
+        two_call = await measure("two_call")
+        structured = await measure("structured")
+        print(
+            f"{latency:>11.1f}s | {statistics.median(two_call) * 1000:>10.0f}ms | "
+            f"{statistics.median(structured) * 1000:>12.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
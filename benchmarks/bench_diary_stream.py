@@ -0,0 +1,45 @@
+"""
+일기 생성 첫 토큰 시간 vs 전체 응답 시간 (로컬 stub provider 사용, 네트워크 호출 없음)
+
+- /generate        : 일기 + 감정 라벨이 모두 끝나야 응답
+- /generate/stream : 첫 delta 이벤트 시점이 사용자가 체감하는 대기 시간
+
+실행: python -m benchmarks.bench_diary_stream
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ["LLM_PROVIDER"] = "stub"
+
+from app.core import llm  # noqa: E402
+from app.schemas.diary_schema import DiaryRequest  # noqa: E402
+from app.services import diary_service  # noqa: E402
+
+LATENCIES = (0.5, 2.0)
+
+
+async def main():
+    llm.logger.disabled = True
+    req = DiaryRequest(user_speech="오늘 진짜 재밌었음ㅋㅋ", image_info=[])
+    print(f"{'stub latency':>12} | {'/generate':>9} | {'stream first delta':>18} | {'stream emoji':>12}")
+    for latency in LATENCIES:
+        llm.register_provider("stub", llm.StubProvider(latency=latency))
+
+        start = time.perf_counter()
+        await diary_service.generate_diary_by_ai(req)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first = None
+        async for event, _ in diary_service.stream_diary(req):
+            if event == "delta" and first is None:
+                first = time.perf_counter() - start
+        last = time.perf_counter() - start
+        print(f"{latency:>11.1f}s | {full * 1000:>7.0f}ms | {first * 1000:>16.0f}ms | {last * 1000:>10.0f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+LLM 호출 동시성 벤치마크 (로컬 stub provider 사용, 네트워크 호출 없음)
+
+- blocking : 기존 방식처럼 동기 호출로 이벤트 루프를 막는 provider
+- async    : app.core.llm 의 비동기 provider
+
+실행: python -m benchmarks.bench_llm_concurrency
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from app.core import llm  # noqa: E402
+
+LATENCY = 0.1
+REQUESTS = 32
+
+
+class BlockingStubProvider(llm.StubProvider):
+    name = "blocking"
+
+    async def generate(self, model, input, **kwargs):
+        time.sleep(self.latency)  # 동기 SDK 호출과 동일하게 루프를 막음
+        return llm.LLMResult(text=self.reply(llm.input_text(input)), provider=self.name, model=model)
+
+
+async def run(provider: str, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            await llm.generate(model="gpt-4.1", input="hello", provider=provider)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    llm.logger.disabled = True
+    llm.register_provider("stub", llm.StubProvider(latency=LATENCY))
+    llm.register_provider("blocking", BlockingStubProvider(latency=LATENCY))
+    print(f"provider latency={LATENCY}s, requests={REQUESTS}")
+    print(f"{'concurrency':>11} | {'blocking req/s':>14} | {'async req/s':>11}")
+    for concurrency in (1, 4, 16, 64):
+        blocking = await run("blocking", concurrency)
+        async_ = await run("stub", concurrency)
+        print(f"{concurrency:>11} | {blocking:>14.1f} | {async_:>11.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+hedged request 유무에 따른 LLM 호출 지연 분포 비교 (로컬 stub provider 사용, 네트워크 호출 없음)
+
+두 provider 모두 대부분 0.2s 안에 응답하지만 일부 호출은 3s 가 걸리는 꼬리 분포를 가진다.
+hedge 를 켜면 p95 를 넘긴 호출만 보조 provider 에도 보내므로 p99 가 크게 줄어든다.
+
+실행: python -m benchmarks.bench_llm_hedge
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ["LLM_PROVIDER"] = "stub"
+
+from app.core import llm, ratelimit  # noqa: E402
+
+CALLS = 400
+CONCURRENCY = 20
+SLOW_RATIO = 0.04
+
+
+class TailStub(llm.StubProvider):
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+    async def generate(self, model, input, **kwargs):
+        await asyncio.sleep(3.0 if random.random() < SLOW_RATIO else random.uniform(0.1, 0.2))
+        return llm.LLMResult(text="ok", provider=self.name, model=model)
+
+
+async def run(hedge: bool) -> list:
+    llm.LLM_HEDGE_ROUTES = {"tail": "tail_backup"} if hedge else {}
+    llm._latencies.clear()
+    llm._hedge_counters.update(hedged=0, wins={})
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    samples = []
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            await llm.generate(model="gpt-4.1", input="hello", provider="tail")
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call() for _ in range(CALLS)))
+    return samples
+
+
+async def main():
+    llm.logger.disabled = True
+    random.seed(0)
+    llm.register_provider("tail", TailStub("tail"))
+    llm.register_provider("tail_backup", TailStub("tail_backup"))
+    # 호출 수가 많으므로 RPM 대기열 영향 없이 provider 지연만 비교
+    ratelimit.set_limits("tail", "gpt-4.1", rpm=0, tpm=0)
+    ratelimit.set_limits("tail_backup", "gpt-4.1", rpm=0, tpm=0)
+    llm.LLM_HEDGE_DEFAULT_DELAY_SECONDS = 1.0
+
+    print(f"{'hedge':>5} | {'p50':>7} | {'p95':>7} | {'p99':>7} | {'hedged':>6} | wins")
+    for hedge in (False, True):
+        samples = sorted(await run(hedge))
+        p = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+        stats = llm.hedge_stats()
+        print(
+            f"{str(hedge):>5} | {statistics.median(samples) * 1000:>5.0f}ms | {p(0.95):>5.0f}ms | "
+            f"{p(0.99):>5.0f}ms | {stats['hedged']:>6} | {stats['wins']}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
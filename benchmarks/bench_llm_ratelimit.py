@@ -0,0 +1,56 @@
+"""
+RPM 제한을 넘는 순간 부하에서 사용자 요청(interactive)과 배치 요청(batch)의 대기 시간 비교
+(로컬 stub provider 사용, 네트워크 호출 없음)
+
+버킷(1분치)을 배치 요청으로 모두 소진한 뒤 배치 BACKLOG 건이 대기 중일 때 사용자 요청이 들어온다.
+거절(429) 없이 모두 처리되고, 사용자 요청은 대기 중인 배치보다 먼저 나간다.
+
+실행: python -m benchmarks.bench_llm_ratelimit
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ["LLM_PROVIDER"] = "stub"
+
+from app.core import llm, ratelimit  # noqa: E402
+
+RPM = 1200
+BACKLOG = 60
+INTERACTIVE = 20
+
+
+async def call(priority: int, samples: list):
+    ratelimit.request_priority.set(priority)
+    start = time.perf_counter()
+    await llm.generate(model="gpt-4.1", input="hello")
+    samples.append(time.perf_counter() - start)
+
+
+async def main():
+    llm.logger.disabled = True
+    llm.register_provider("stub", llm.StubProvider(latency=0.05))
+    ratelimit.set_limits("stub", "gpt-4.1", rpm=RPM, tpm=0)
+
+    batch, interactive = [], []
+    tasks = [asyncio.ensure_future(call(ratelimit.BATCH, batch)) for _ in range(RPM + BACKLOG)]
+    await asyncio.sleep(0.1)
+    tasks += [asyncio.ensure_future(call(ratelimit.INTERACTIVE, interactive)) for _ in range(INTERACTIVE)]
+    await asyncio.sleep(0)
+    depth = ratelimit.rate_limit_stats()["stub/gpt-4.1"]["waiting"]
+    await asyncio.gather(*tasks)
+
+    queued = sorted(batch)[RPM:]  # 버킷 소진 후 대기한 배치 요청
+    stats = ratelimit.rate_limit_stats()["stub/gpt-4.1"]
+    print(f"rpm={RPM} burst={RPM + BACKLOG} batch + {INTERACTIVE} interactive, queue depth={depth}")
+    print(f"{'class':>11} | {'p50':>7} | {'max':>7}")
+    print(f"{'interactive':>11} | {statistics.median(interactive) * 1000:>5.0f}ms | {max(interactive) * 1000:>5.0f}ms")
+    print(f"{'batch(wait)':>11} | {statistics.median(queued) * 1000:>5.0f}ms | {max(queued) * 1000:>5.0f}ms")
+    print(f"admitted={stats['admitted']} rejected={stats['rejected']} peak_waiting={stats['peak_waiting']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+일시적 provider 오류에 대한 재시도 / circuit breaker 동작 확인 (로컬 stub provider 사용, 네트워크 호출 없음)
+
+1) 호출의 FAIL_RATIO 가 연결 오류로 실패하는 provider: 재시도 유무에 따른 성공률과 지연
+2) provider 가 완전히 죽은 경우: circuit 이 열린 뒤 호출이 provider 를 거치지 않고 바로 실패하는지
+
+실행: python -m benchmarks.bench_llm_resilience
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ["LLM_PROVIDER"] = "stub"
+
+import httpx  # noqa: E402
+import openai  # noqa: E402
+
+from app.core import llm, resilience  # noqa: E402
+
+CALLS = 200
+FAIL_RATIO = 0.2
+
+
+class FlakyStub(llm.StubProvider):
+    def __init__(self, fail_ratio: float):
+        super().__init__(latency=0.05)
+        self.fail_ratio = fail_ratio
+        self.calls = 0
+
+    async def generate(self, model, input, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.fail_ratio:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://stub/v1/responses"))
+        return llm.LLMResult(text="ok", provider=self.name, model=model)
+
+
+async def run(calls: int) -> tuple:
+    ok, samples = 0, []
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            await llm.generate(model="gpt-4.1", input="hello")
+            ok += 1
+        except Exception:
+            pass
+        samples.append(time.perf_counter() - start)
+    return ok, samples
+
+
+async def main():
+    llm.logger.disabled = True
+    random.seed(0)
+    resilience.LLM_RETRY_BASE_SECONDS = 0.05
+    resilience.LLM_BREAKER_RESET_SECONDS = 60
+
+    print(f"{'attempts':>8} | {'success':>7} | {'p50':>6} | {'max':>6} | provider calls")
+    for attempts in (1, 3):
+        resilience.LLM_RETRY_MAX_ATTEMPTS = attempts
+        resilience._breakers.clear()
+        provider = FlakyStub(FAIL_RATIO)
+        llm.register_provider("stub", provider)
+        ok, samples = await run(CALLS)
+        print(
+            f"{attempts:>8} | {ok / CALLS:>6.1%} | {statistics.median(samples) * 1000:>4.0f}ms | "
+            f"{max(samples) * 1000:>4.0f}ms | {provider.calls}"
+        )
+
+    resilience._breakers.clear()
+    provider = FlakyStub(1.0)
+    llm.register_provider("stub", provider)
+    ok, samples = await run(50)
+    stats = resilience.resilience_stats()["stub/gpt-4.1"]
+    print(
+        f"provider down: 50 calls -> provider calls={provider.calls}, state={stats['state']}, "
+        f"short_circuited={stats['short_circuited']}, last call {samples[-1] * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
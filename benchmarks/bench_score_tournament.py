@@ -0,0 +1,77 @@
+"""
+/score LLM 단계 end-to-end 지연: 단일 호출 vs 토너먼트 (로컬 stub provider)
+
+stub 지연 모델: 호출당 0.5s + 콜라주당 0.3s + 후보 이미지당 0.05s (이미지별 [thinking] 출력)
+콜라주 렌더링/인코딩 시간은 실제로 측정된다.
+
+기본 설정에서 후보 상한(SCORER_MAX_CANDIDATES)인 앨범이 토너먼트가 더 느린 구간이므로
+단일 호출로 처리되는지도 확인한다 (LLM 호출이 1건이어야 함).
+
+실행: python -m benchmarks.bench_score_tournament
+"""
+import asyncio
+import os
+import time
+from io import BytesIO
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from PIL import Image  # noqa: E402
+
+from app.core import llm  # noqa: E402
+from app.services import image_scorer_service as scorer  # noqa: E402
+
+ALBUM_SIZES = (32, 48, 64, 128)
+
+
+class CostModelStub(llm.StubProvider):
+    calls = 0
+
+    async def generate(self, model, input, **kwargs):
+        self.calls += 1
+        parts = input[0]["content"]
+        collages = sum(1 for p in parts if p["type"] == "input_image")
+        await asyncio.sleep(0.5 + 0.3 * collages + 0.05 * 16 * collages)
+        return llm.LLMResult(text=self.reply(llm.input_text(input)), provider=self.name, model=model)
+
+
+def make_album(n):
+    img = Image.effect_mandelbrot((1200, 900), (-2, -1.2, 1, 1.2), 64).convert("RGB")
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return [(buffer.getvalue(), i) for i in range(n)]
+
+
+async def measure(album, tournament: bool, fanout: int = 1) -> float:
+    scorer.SCORER_TOURNAMENT_ENABLED = tournament
+    scorer.SCORER_FANOUT_COLLAGES = fanout
+    start = time.perf_counter()
+    await scorer.select_with_llm(album, [])
+    return time.perf_counter() - start
+
+
+async def check_max_album_uses_single_call(stub):
+    stub.calls = 0
+    await scorer.select_with_llm(make_album(scorer.SCORER_MAX_CANDIDATES), [])
+    assert stub.calls == 1, f"{scorer.SCORER_MAX_CANDIDATES}장 앨범이 토너먼트를 사용함 (호출 {stub.calls}건)"
+    print(f"{scorer.SCORER_MAX_CANDIDATES}장 앨범: 단일 호출 (LLM 호출 {stub.calls}건)")
+
+
+async def main():
+    scorer.logger.disabled = True
+    stub = CostModelStub()
+    llm.register_provider("stub", stub)
+    await check_max_album_uses_single_call(stub)
+    print(f"{'album':>5} | {'single call':>11} | {'tournament w=1':>14} | {'tournament w=2':>14}")
+    for n in ALBUM_SIZES:
+        album = make_album(n)
+        single = await measure(album, tournament=False)
+        fanout1 = await measure(album, tournament=True, fanout=1)
+        fanout2 = await measure(album, tournament=True, fanout=2)
+        print(f"{n:>5} | {single:>10.2f}s | {fanout1:>13.2f}s | {fanout2:>13.2f}s")
+
+
+if __name__ == "__main__":
+    llm.LLM_PROVIDER = "stub"
+    asyncio.run(main())